@@ -12,6 +12,22 @@ class Settings(BaseSettings):
     openai_api_key: str = ""
     llm_model: str = "gpt-4o"
     llm_temperature: float = 0.1
+    # Cache of model responses keyed on model parameters + exact prompt
+    llm_cache_enabled: bool = True
+    llm_cache_size: int = 256  # in-process entries
+    llm_cache_ttl_seconds: int = 86400
+    llm_cache_redis: bool = True  # share across replicas and restarts
+    # Token budget for each prompt's user message, split across its sections
+    prompt_token_budget: int = 12000
+    prompt_section_weights: dict[str, float] = {
+        "alert": 1.0,
+        "problem_frame": 1.0,
+        "hypotheses": 2.0,
+        "evidence": 4.0,
+        "correlation": 2.0,
+        "runbooks": 2.0,
+        "past_incidents": 1.0,
+    }
 
     # Observability backends
     prometheus_url: str = "http://prometheus:9090"
@@ -28,12 +44,89 @@ class Settings(BaseSettings):
     dedup_window_seconds: int = 300
     max_concurrent_investigations: int = 3
     investigation_timeout_seconds: int = 600
+    investigation_max_attempts: int = 2
+    # The graph aims to finish deadline_margin_seconds before the hard timeout,
+    # keeping report_reserve_seconds of that for the (possibly partial) RCA
+    deadline_margin_seconds: int = 15
+    report_reserve_seconds: int = 60
+    checkpoint_ttl_seconds: int = 86400
+    checkpoint_history: int = 1  # checkpoints kept per thread; older ones are pruned
+    worker_batch_size: int = 10
+    worker_block_ms: int = 2000
+
+    # Adaptive concurrency — AIMD between concurrency_min and concurrency_max,
+    # starting from max_concurrent_investigations. Both are per replica and
+    # clamped to cluster_max_concurrent_investigations, which caps the cluster.
+    adaptive_concurrency: bool = True
+    concurrency_min: int = 1
+    concurrency_max: int = 8
+    concurrency_adjust_interval_seconds: int = 30
+    concurrency_error_rate_threshold: float = 0.2
+    llm_latency_target_seconds: float = 30.0
+    backend_latency_target_seconds: float = 5.0
+
+    # Multi-replica workers
+    consumer_name: str = ""  # defaults to "<hostname>-<pid>"
+    cluster_max_concurrent_investigations: int = 3
+    lease_ttl_seconds: int = 60
+    reclaim_idle_seconds: int = 180
+    reclaim_interval_seconds: int = 30
+
+    # Severity lanes — "strict" always drains higher lanes first,
+    # "weighted" shares slots by lane_weights
+    lane_policy: str = "strict"
+    lane_weights: dict[str, int] = {"critical": 6, "warning": 3, "info": 1}
+
+    # Stream retention — acknowledged entries are trimmed periodically,
+    # stream_maxlen is a hard (approximate) cap per lane
+    stream_maxlen: int = 10000
+    stream_trim_interval_seconds: int = 60
+
+    # Alert coalescing — alerts sharing a key within the window are folded
+    # into the first one's investigation (0 disables)
+    coalesce_window_seconds: int = 20
+    coalesce_by: str = "service"  # "group_key", "service" or "labels"
+    coalesce_labels: list[str] = ["job", "instance"]
+
+    # Backend HTTP transport — one connection pool per backend
+    http_pool_sizes: dict[str, int] = {"prometheus": 16, "loki": 8, "tempo": 12}
+    http_keepalive_seconds: float = 30.0
+    http_timeout_seconds: float = 15.0
+    http2: bool = False  # multiplex queries over one connection per backend
+    # Per-request latency budgets; a request still running at the backend's
+    # observed p95 is hedged with a duplicate, first response wins
+    backend_latency_budgets: dict[str, float] = {"prometheus": 8.0, "loki": 12.0, "tempo": 10.0}
+    hedge_enabled: bool = True
+    hedge_min_samples: int = 20
+    circuit_failure_threshold: int = 5
+    circuit_cooldown_seconds: int = 30
+
+    # Backend query cache — shared by all investigations; window bounds are
+    # widened to the bucket so near-identical windows share an entry
+    query_cache_bucket_seconds: int = 30
+    query_cache_ttl_seconds: int = 300  # windows that have closed
+    query_cache_recent_ttl_seconds: int = 15  # windows still open (0 disables)
 
     # Investigation tuning
     max_investigation_iterations: int = 6
     confidence_threshold: float = 0.7
+    convergence_delta: float = 0.05  # max likelihood change that counts as stable
+    convergence_patience: int = 1  # stable rounds (same top-3 ranking) before stopping
     query_lookback_minutes: int = 30
     query_lookahead_minutes: int = 10
+    evidence_refresh_seconds: int = 120  # re-run queries whose window is still open after this
+    prometheus_max_concurrency: int = 8
+    loki_max_concurrency: int = 3
+    tempo_max_concurrency: int = 4
+    prometheus_points_per_series: int = 60  # range query step = window / points
+    prometheus_max_series: int = 20  # top-k by variance; 0 keeps all
+    loki_line_limit: int = 5000  # lines fetched per query, mined into templates
+    loki_page_size: int = 1000
+    loki_max_patterns: int = 20  # templates returned per query
+    loki_max_templates: int = 500  # templates mined per query; later novel lines only counted
+    tempo_fetch_traces: int = 5  # matching traces fetched in full per search
+    tempo_fetch_concurrency: int = 4
+    tempo_max_spans_per_trace: int = 50
 
     # Agent server
     host: str = "0.0.0.0"
@@ -10,6 +10,18 @@ from agent.ingestion.models import NormalizedAlert
 
 logger = logging.getLogger("agent.enrichment")
 
+# Differ between deliveries of the same alert (a fresh id per normalization,
+# the raw payload, timestamps) — kept out of prompts so a flapping or manually
+# re-triggered alert rebuilds the same prompt and hits the LLM cache
+_VOLATILE_ALERT_FIELDS = {"id", "raw", "starts_at", "ends_at"}
+
+
+def alert_for_prompt(alert: NormalizedAlert) -> dict:
+    """The alert as LLM prompts see it — its stable fields only."""
+    exclude = {field: True for field in _VOLATILE_ALERT_FIELDS}
+    exclude["related_alerts"] = {"__all__": _VOLATILE_ALERT_FIELDS}
+    return alert.model_dump(mode="json", exclude=exclude)
+
 
 class ContextBuilder:
     """Assembles enrichment context for an alert: knowledge + live signal correlation."""
@@ -19,23 +31,26 @@ class ContextBuilder:
         self._correlator = correlator
 
     async def build(self, alert: NormalizedAlert) -> dict:
-        search_query = f"{alert.name} {alert.summary} {alert.description}"
+        search_query = " ".join(
+            f"{a.name} {a.summary} {a.description}" for a in (alert, *alert.related_alerts)
+        )
 
         runbooks = self._knowledge.search_runbooks(search_query) if self._knowledge else []
         past_incidents = self._knowledge.search_incidents(search_query) if self._knowledge else []
         correlation = await self._correlator.correlate(alert.name, alert.starts_at)
 
         context = {
-            "alert": alert.model_dump(mode="json"),
+            "alert": alert_for_prompt(alert),
             "runbook_context": [r["content"] for r in runbooks],
             "past_incidents": [i["content"] for i in past_incidents],
             "correlation": correlation,
         }
 
         logger.info(
-            "Context built for alert=%s: %d runbook chunks, %d past incidents, "
+            "Context built for alert=%s (+%d related): %d runbook chunks, %d past incidents, "
             "%d error logs, %d traces",
             alert.id,
+            len(alert.related_alerts),
             len(runbooks),
             len(past_incidents),
             correlation.get("error_logs_count", 0),
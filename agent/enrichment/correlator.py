@@ -4,82 +4,73 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta
 
-import httpx
-
-from agent.config import settings
+from agent.investigation.tools.loki import LokiClient
+from agent.investigation.tools.prometheus import PrometheusClient
+from agent.investigation.tools.tempo import TempoClient
 
 logger = logging.getLogger("agent.enrichment")
 
 
 class SignalCorrelator:
-    """Pulls a snapshot from each backend around an alert window and finds connections."""
+    """Pulls a snapshot from each backend around an alert window and finds connections.
 
-    def __init__(self) -> None:
-        self._http = httpx.AsyncClient(timeout=15.0)
+    Goes through the shared investigation clients so its fixed queries are
+    deduplicated and cached alongside the investigations' own.
+    """
 
-    async def close(self) -> None:
-        await self._http.aclose()
+    def __init__(self, prometheus: PrometheusClient, loki: LokiClient, tempo: TempoClient) -> None:
+        self._prometheus = prometheus
+        self._loki = loki
+        self._tempo = tempo
 
     async def get_metrics_snapshot(
         self, queries: list[str], center: datetime, window_minutes: int = 15
     ) -> dict[str, list]:
         """Run a batch of PromQL instant queries around the alert time."""
         results: dict[str, list] = {}
-        ts = center.timestamp()
         for q in queries:
             try:
-                resp = await self._http.get(
-                    f"{settings.prometheus_url}/api/v1/query",
-                    params={"query": q, "time": ts},
-                )
-                data = resp.json()
-                results[q] = data.get("data", {}).get("result", [])
+                data = await self._prometheus.instant_query(q, time=center)
+                results[q] = data.get("result", [])
             except Exception:
                 logger.exception("Prometheus query failed: %s", q)
                 results[q] = []
         return results
 
-    async def get_recent_errors(self, center: datetime, window_minutes: int = 15) -> list[dict]:
-        """Pull error-level logs from Loki around the alert time."""
+    async def get_recent_errors(self, center: datetime, window_minutes: int = 15) -> dict:
+        """Exact error-log count plus the dominant error patterns around the alert time."""
         start = center - timedelta(minutes=window_minutes)
         end = center + timedelta(minutes=window_minutes // 3)
-        logql = '{service_name="sre-playground"} |= "error" | json'
+        selector = '{service_name="sre-playground"} |= "error"'
         try:
-            resp = await self._http.get(
-                f"{settings.loki_url}/loki/api/v1/query_range",
-                params={
-                    "query": logql,
-                    "start": int(start.timestamp()),
-                    "end": int(end.timestamp()),
-                    "limit": 50,
-                },
+            counts, lines = await asyncio.gather(
+                self._loki.count(selector, start, end),
+                self._loki.query_range(f"{selector} | json", start=start, end=end, limit=500, sample=0),
             )
-            data = resp.json()
-            return data.get("data", {}).get("result", [])
         except Exception:
             logger.exception("Loki error log query failed")
-            return []
+            return {}
+        failed = next((r["error"] for r in (counts, lines) if r.get("status") == "error"), None)
+        if failed:
+            logger.warning("Loki error log query failed: %s", failed)
+            return {}
+        return {"total": counts.get("total", 0), "patterns": lines.get("patterns", {})}
 
-    async def get_error_traces(self, center: datetime, window_minutes: int = 15) -> list[dict]:
-        """Search Tempo for error traces around the alert time."""
+    async def get_error_traces(self, center: datetime, window_minutes: int = 15) -> dict:
+        """Search Tempo for error traces around the alert time and fetch a few in full."""
         start = center - timedelta(minutes=window_minutes)
         end = center + timedelta(minutes=window_minutes // 3)
         try:
-            resp = await self._http.get(
-                f"{settings.tempo_url}/api/search",
-                params={
-                    "start": int(start.timestamp()),
-                    "end": int(end.timestamp()),
-                    "limit": 20,
-                },
-            )
-            data = resp.json()
-            return data.get("traces", [])
+            traces = await self._tempo.search_traces("{ status = error }", start=start, end=end, limit=20)
         except Exception:
             logger.exception("Tempo trace search failed")
-            return []
+            return {}
+        if traces.get("status") == "error":
+            logger.warning("Tempo trace search failed: %s", traces.get("error"))
+            return {}
+        return traces
 
     async def correlate(self, alert_name: str, alert_time: datetime) -> dict:
         """Build a correlation snapshot for an alert."""
@@ -100,10 +91,9 @@ class SignalCorrelator:
 
         return {
             "alert_name": alert_name,
-            "alert_time": alert_time.isoformat(),
             "metrics": metrics,
-            "error_logs_count": sum(len(r.get("values", [])) for r in errors),
-            "error_logs_sample": errors[:5],
-            "traces_found": len(traces),
-            "traces_sample": traces[:5],
+            "error_logs_count": errors.get("total", 0),
+            "error_log_patterns": errors.get("patterns", {}).get("top", [])[:5],
+            "traces_found": traces.get("traces_found", 0),
+            "trace_analysis": traces.get("analysis", {}),
         }
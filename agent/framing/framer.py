@@ -2,13 +2,15 @@
 
 from __future__ import annotations
 
-import json
 import logging
 
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.language_models import BaseChatModel
 
 from agent.framing.models import ProblemFrame
+from agent.investigation.budget import (
+    alert_section, build_prompt, log_usage, mapping_section, ranked_section,
+)
 
 logger = logging.getLogger("agent.framing")
 
@@ -34,17 +36,18 @@ Respond ONLY with valid JSON matching this schema:
 
 async def frame_problem(llm: BaseChatModel, context: dict) -> ProblemFrame:
     """Ask the LLM to produce a ProblemFrame from enriched alert context."""
-    user_content = (
-        f"Alert: {json.dumps(context['alert'], default=str)}\n\n"
-        f"Runbook context:\n{chr(10).join(context.get('runbook_context', []))}\n\n"
-        f"Past incidents:\n{chr(10).join(context.get('past_incidents', []))}\n\n"
-        f"Signal correlation:\n{json.dumps(context.get('correlation', {}), default=str)}"
-    )
+    user_content = build_prompt([
+        alert_section("Alert", context["alert"]),
+        ranked_section("runbooks", "Runbook context", context.get("runbook_context", [])),
+        ranked_section("past_incidents", "Past incidents", context.get("past_incidents", [])),
+        mapping_section("correlation", "Signal correlation", context.get("correlation", {})),
+    ], step="frame")
 
     response = await llm.ainvoke([
         SystemMessage(content=_SYSTEM_PROMPT),
         HumanMessage(content=user_content),
     ])
+    log_usage("frame", response)
 
     raw = response.content.strip()
     if raw.startswith("```"):
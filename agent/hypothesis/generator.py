@@ -10,6 +10,9 @@ from langchain_core.language_models import BaseChatModel
 
 from agent.framing.models import ProblemFrame
 from agent.hypothesis.models import Hypothesis
+from agent.investigation.budget import (
+    Section, alert_section, build_prompt, log_usage, mapping_section, ranked_section,
+)
 
 logger = logging.getLogger("agent.hypothesis")
 
@@ -20,8 +23,12 @@ to test it.
 
 Available tools:
 - prometheus: PromQL queries against Prometheus (metrics)
-- loki: LogQL queries against Loki (logs)
-- tempo: TraceQL search against Tempo (traces)
+- loki: LogQL queries against Loki (logs). When you only need how often something \
+happens, say so in the purpose (e.g. "count timeouts per minute") or write a metric \
+query such as sum by (level) (count_over_time({...} |= "timeout" [1m])) — counts are \
+computed in Loki and are exact, while raw line results are summarized into patterns.
+- tempo: TraceQL search against Tempo (traces), e.g. { status = error && duration > 2s }; \
+the first few matching traces are fetched in full
 
 Respond ONLY with a JSON array of hypotheses:
 [
@@ -47,17 +54,18 @@ async def generate_hypotheses(
     context: dict,
 ) -> list[Hypothesis]:
     """Generate ranked hypotheses from the problem frame and context."""
-    user_content = (
-        f"Problem frame:\n{frame.model_dump_json(indent=2)}\n\n"
-        f"Alert details:\n{json.dumps(context.get('alert', {}), default=str)}\n\n"
-        f"Runbook context:\n{chr(10).join(context.get('runbook_context', []))}\n\n"
-        f"Signal correlation:\n{json.dumps(context.get('correlation', {}), default=str)}"
-    )
+    user_content = build_prompt([
+        Section("problem_frame", "Problem frame").add(frame.model_dump_json()),
+        alert_section("Alert details", context.get("alert", {})),
+        ranked_section("runbooks", "Runbook context", context.get("runbook_context", [])),
+        mapping_section("correlation", "Signal correlation", context.get("correlation", {})),
+    ], step="hypothesize")
 
     response = await llm.ainvoke([
         SystemMessage(content=_SYSTEM_PROMPT),
         HumanMessage(content=user_content),
     ])
+    log_usage("hypothesize", response)
 
     raw = response.content.strip()
     if raw.startswith("```"):
@@ -9,43 +9,83 @@ from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.language_models import BaseChatModel
 
 from agent.hypothesis.models import Hypothesis, HypothesisStatus
+from agent.investigation.budget import build_prompt, evidence_section, hypotheses_section, log_usage
 
 logger = logging.getLogger("agent.hypothesis")
 
 _SYSTEM_PROMPT = """\
 You are an SRE investigator evaluating hypotheses against gathered evidence.
 
+Each hypothesis comes with its current assessment — likelihood, status, the \
+supporting and contradicting evidence noted so far, and a verdict — which already \
+accounts for all earlier evidence. You are given only the evidence gathered since.
+
 For each hypothesis, decide:
-1. Update its likelihood (0.0-1.0) based on new evidence
+1. Update its likelihood (0.0-1.0) based on the new evidence
 2. Set status to: confirmed, rejected, or inconclusive
-3. Note supporting and contradicting evidence
-4. Provide a brief verdict
+3. Note supporting and contradicting evidence (brief, one finding per entry)
+4. Provide a brief verdict that summarizes the assessment so far
 
-Respond with a JSON array matching the input structure, with updated fields.
+Respond ONLY with a JSON array, one object per hypothesis:
+[{"id": "...", "likelihood": 0.0, "status": "...", "supporting_evidence": ["..."], \
+"contradicting_evidence": ["..."], "verdict": "..."}]
 """
 
+# Notes kept per hypothesis, so the running assessment stays a constant size
+_MAX_NOTES = 5
+
+_ASSESSMENT_FIELDS = {
+    "id", "title", "description", "likelihood", "status",
+    "supporting_evidence", "contradicting_evidence", "verdict",
+}
+_UPDATABLE_FIELDS = ("likelihood", "status", "supporting_evidence", "contradicting_evidence", "verdict")
+
+
+def _assessment(h: Hypothesis) -> dict:
+    """The hypothesis as the model needs to see it — no query plan."""
+    return h.model_dump(mode="json", include=_ASSESSMENT_FIELDS)
+
+
+def _merge(current: Hypothesis, update: dict) -> Hypothesis:
+    changes = {k: update[k] for k in _UPDATABLE_FIELDS if k in update}
+    for notes in ("supporting_evidence", "contradicting_evidence"):
+        if notes in changes:
+            changes[notes] = list(changes[notes])[-_MAX_NOTES:]
+    # Validate through the model so bad likelihoods/statuses are rejected, not stored
+    return Hypothesis.model_validate({**current.model_dump(), **changes})
+
 
 async def rerank_hypotheses(
     llm: BaseChatModel,
     hypotheses: list[Hypothesis],
     evidence: list[dict],
 ) -> list[Hypothesis]:
-    """Re-evaluate hypotheses in light of new evidence."""
-    user_content = (
-        f"Hypotheses:\n{json.dumps([h.model_dump() for h in hypotheses], indent=2)}\n\n"
-        f"New evidence:\n{json.dumps(evidence, indent=2, default=str)}"
-    )
+    """Update each hypothesis's assessment with evidence gathered since the last one.
+
+    Only the assessments and the new evidence are sent, so the prompt stays
+    roughly the same size however many iterations have run. Updates are
+    merged back by id; the query plans never leave this process.
+    """
+    user_content = build_prompt([
+        hypotheses_section("Current assessments", [_assessment(h) for h in hypotheses]),
+        evidence_section("New evidence", evidence),
+    ], step="rerank")
 
     response = await llm.ainvoke([
         SystemMessage(content=_SYSTEM_PROMPT),
         HumanMessage(content=user_content),
     ])
+    log_usage("rerank", response)
 
     raw = response.content.strip()
     if raw.startswith("```"):
         raw = raw.split("\n", 1)[1].rsplit("```", 1)[0]
 
-    updated = [Hypothesis.model_validate(h) for h in json.loads(raw)]
+    updates = {u["id"]: u for u in json.loads(raw) if isinstance(u, dict) and "id" in u}
+    unknown = updates.keys() - {h.id for h in hypotheses}
+    if unknown:
+        logger.warning("Reranker returned unknown hypothesis ids, ignoring: %s", ", ".join(sorted(unknown)))
+    updated = [_merge(h, updates[h.id]) if h.id in updates else h for h in hypotheses]
     updated.sort(key=lambda h: h.likelihood, reverse=True)
 
     confirmed = [h for h in updated if h.status == HypothesisStatus.CONFIRMED]
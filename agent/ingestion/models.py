@@ -61,4 +61,7 @@ class NormalizedAlert(BaseModel):
     ends_at: datetime | None = None
     generator_url: str = ""
     fingerprint: str = ""
+    group_key: str = ""
     raw: dict = {}
+    # Near-simultaneous alerts folded into this one's investigation (see coalescing)
+    related_alerts: list[NormalizedAlert] = []
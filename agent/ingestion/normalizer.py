@@ -33,7 +33,7 @@ def _parse_ts(raw: str) -> datetime:
     return datetime.now(timezone.utc)
 
 
-def normalize_raw_alert(raw: RawAlert) -> NormalizedAlert:
+def normalize_raw_alert(raw: RawAlert, group_key: str = "") -> NormalizedAlert:
     severity_str = raw.labels.get("severity", "warning").lower()
     return NormalizedAlert(
         name=raw.labels.get("alertname", "unknown"),
@@ -46,6 +46,7 @@ def normalize_raw_alert(raw: RawAlert) -> NormalizedAlert:
         ends_at=_parse_ts(raw.ends_at) if raw.ends_at else None,
         generator_url=raw.generator_url,
         fingerprint=raw.fingerprint,
+        group_key=group_key,
         raw=raw.model_dump(),
     )
 
@@ -55,7 +56,7 @@ def normalize_payload(payload: AlertmanagerPayload) -> list[NormalizedAlert]:
     alerts = []
     for raw_alert in payload.alerts:
         try:
-            alerts.append(normalize_raw_alert(raw_alert))
+            alerts.append(normalize_raw_alert(raw_alert, group_key=payload.group_key))
         except Exception:
             logger.exception("Failed to normalize alert: %s", raw_alert.labels)
     return alerts
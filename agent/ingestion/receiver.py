@@ -6,9 +6,10 @@ import logging
 
 from fastapi import APIRouter
 
+from agent.config import settings
 from agent.ingestion.models import AlertmanagerPayload, NormalizedAlert
 from agent.ingestion.normalizer import normalize_payload
-from agent.queue.producer import enqueue_alert
+from agent.queue.producer import COALESCED_PREFIX, encode_alert, enqueue_alerts
 
 logger = logging.getLogger("agent.ingestion")
 router = APIRouter(prefix="/alerts", tags=["ingestion"])
@@ -16,25 +17,29 @@ router = APIRouter(prefix="/alerts", tags=["ingestion"])
 
 @router.post("/webhook")
 async def alertmanager_webhook(payload: AlertmanagerPayload):
-    """Receive Alertmanager webhook, dedup, and enqueue for investigation."""
+    """Receive Alertmanager webhook, dedup, and enqueue for investigation in one round trip."""
     alerts = normalize_payload(payload)
     firing = [a for a in alerts if a.status.value == "firing"]
 
     logger.info("Received %d alerts (%d firing)", len(alerts), len(firing))
 
     enqueued = []
+    coalesced = {}
     deduplicated = []
-    for alert in firing:
-        msg_id = await enqueue_alert(alert)
-        if msg_id:
-            enqueued.append(alert.id)
-        else:
+    msg_ids = await enqueue_alerts(firing)
+    for alert, msg_id in zip(firing, msg_ids):
+        if not msg_id:
             deduplicated.append(alert.id)
+        elif msg_id.startswith(COALESCED_PREFIX):
+            coalesced[alert.id] = msg_id.removeprefix(COALESCED_PREFIX)
+        else:
+            enqueued.append(alert.id)
 
     return {
         "received": len(alerts),
         "firing": len(firing),
         "enqueued": enqueued,
+        "coalesced": coalesced,
         "deduplicated": deduplicated,
     }
 
@@ -42,10 +47,15 @@ async def alertmanager_webhook(payload: AlertmanagerPayload):
 @router.post("/manual")
 async def manual_trigger(alert: NormalizedAlert):
     """Manually trigger an investigation with a crafted alert (bypasses dedup)."""
-    from agent.queue.redis_client import STREAM_KEY, get_redis
+    from agent.queue.redis_client import get_redis, lane_key
 
     r = await get_redis()
-    msg_id = await r.xadd(STREAM_KEY, {"alert_json": alert.model_dump_json()})
+    msg_id = await r.xadd(
+        lane_key(alert.severity.value),
+        {"alert_json": encode_alert(alert)},
+        maxlen=settings.stream_maxlen,
+        approximate=True,
+    )
     logger.info("Manual investigation enqueued: alert=%s name=%s msg=%s", alert.id, alert.name, msg_id)
 
     return {"investigation_enqueued": alert.id, "alert_name": alert.name, "stream_msg": msg_id}
@@ -0,0 +1,208 @@
+"""Prompt token budgeting — bound every LLM prompt by section.
+
+A prompt is a list of named sections (alert, runbooks, evidence, ...), each a
+list of items with a priority. ``prompt_token_budget`` is split across the
+sections present by ``prompt_section_weights``; budget a section doesn't need
+flows to the others. Within a section the highest-priority items are kept,
+the rest are dropped with a note, and a single item too large for what is
+left is truncated. Kept items are rendered in their original order.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from agent.config import settings
+from agent.investigation.state import evidence_failed
+
+logger = logging.getLogger("agent.investigation")
+
+_CHARS_PER_TOKEN = 4
+_TRUNCATED = " …[truncated]"
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(settings.llm_model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Encodings are downloaded on first use — offline hosts estimate instead
+        logger.warning("tiktoken encoding unavailable, estimating prompt tokens", exc_info=True)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Exact for OpenAI models with tiktoken installed, else ~4 chars per token."""
+    encoder = _encoder()
+    if encoder is None:
+        return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def _truncate(text: str, tokens: int) -> str:
+    if tokens <= 0:
+        return ""
+    chars = tokens * _CHARS_PER_TOKEN
+    while chars > 0:
+        cut = text[:chars] + _TRUNCATED
+        if count_tokens(cut) <= tokens:
+            return cut
+        chars = int(chars * 0.8)
+    return ""
+
+
+@dataclass
+class Section:
+    """A titled prompt section; higher ``priority`` items survive budget cuts longer."""
+
+    name: str
+    title: str
+    items: list[tuple[str, float]] = field(default_factory=list)
+    joiner: str = "\n"
+
+    def add(self, text: str, priority: float = 0.0) -> Section:
+        if text:
+            self.items.append((text, priority))
+        return self
+
+    def tokens(self) -> int:
+        """Tokens the whole section takes when nothing is cut."""
+        return count_tokens(f"{self.title}:\n" + self.joiner.join(t for t, _ in self.items))
+
+    def render(self, budget: int) -> tuple[str, int]:
+        """Section text within ``budget`` tokens, and the tokens it used."""
+        header = f"{self.title}:\n"
+        whole = self.tokens()
+        if whole <= budget:
+            return header + self.joiner.join(t for t, _ in self.items), whole
+        left = budget - count_tokens(header)
+        ranked = sorted(range(len(self.items)), key=lambda i: self.items[i][1], reverse=True)
+        kept: dict[int, str] = {}
+        for i in ranked:
+            text = self.items[i][0]
+            cost = count_tokens(self.joiner + text)
+            if cost <= left:
+                kept[i] = text
+                left -= cost
+            elif not kept and left > 0:
+                # Nothing fits yet — a cut-down copy of the most valuable item beats none
+                kept[i] = _truncate(text, left)
+                left = 0
+        dropped = len(self.items) - len(kept)
+        body = self.joiner.join(kept[i] for i in sorted(kept))
+        if dropped:
+            body += f"{self.joiner}[{dropped} lower-priority item(s) omitted for length]"
+        text = header + body
+        return text, count_tokens(text)
+
+
+def json_item(obj) -> str:
+    return json.dumps(obj, default=str, separators=(",", ":"))
+
+
+def ranked_section(name: str, title: str, texts: list[str]) -> Section:
+    """Items already in relevance order (runbook chunks, past incidents) — the tail goes first."""
+    section = Section(name, title)
+    for i, text in enumerate(texts):
+        section.add(text, -i)
+    return section
+
+
+def mapping_section(name: str, title: str, data: dict) -> Section:
+    """One compact JSON item per key, later keys dropped first."""
+    section = Section(name, title)
+    for i, (key, value) in enumerate(data.items()):
+        section.add(json_item({key: value}), -i)
+    return section
+
+
+# Alert fields grouped into items, most telling first; any other field follows
+_ALERT_FIELD_GROUPS = (
+    ("name", "severity", "status", "source"),
+    ("summary", "description"),
+    ("labels",),
+    ("fingerprint", "group_key", "generator_url"),
+)
+
+
+def alert_section(title: str, alert: dict) -> Section:
+    """The alert as field groups, then one item per related alert — the tail goes first."""
+    rest = dict(alert)
+    related = rest.pop("related_alerts", None) or []
+    groups = [{key: rest.pop(key) for key in group if key in rest} for group in _ALERT_FIELD_GROUPS]
+    texts = [json_item(group) for group in (*groups, rest) if group]
+    texts += [json_item({"related_alert": a}) for a in related]
+    return ranked_section("alert", title, texts)
+
+
+def hypotheses_section(title: str, hypotheses: list[dict]) -> Section:
+    """One item per hypothesis, so a cut drops the least likely ones whole, ids and all."""
+    section = Section("hypotheses", title)
+    for h in hypotheses:
+        section.add(json_item(h), h.get("likelihood") or 0.0)
+    return section
+
+
+def evidence_section(title: str, evidence: list[dict]) -> Section:
+    """Evidence entries — failed queries go first, then the oldest results."""
+    section = Section("evidence", title)
+    for i, entry in enumerate(evidence):
+        section.add(json_item(entry), i - (len(evidence) if evidence_failed(entry) else 0))
+    return section
+
+
+def build_prompt(sections: list[Section], step: str, budget: int | None = None) -> str:
+    """Render sections within the token budget, water-filling unused shares."""
+    budget = budget or settings.prompt_token_budget
+    present = [s for s in sections if s.items]
+    weights = {s.name: settings.prompt_section_weights.get(s.name, 1.0) for s in present}
+    need = {s.name: s.tokens() for s in present}
+
+    # Sections that fit in their weighted share are granted what they need;
+    # the remainder is re-split among the rest until nothing changes
+    grants: dict[str, int] = {}
+    remaining, pending = budget, list(present)
+    while pending:
+        total_weight = sum(weights[s.name] for s in pending) or 1.0
+        fits = [s for s in pending if need[s.name] <= remaining * weights[s.name] / total_weight]
+        if not fits:
+            for s in pending:
+                grants[s.name] = int(remaining * weights[s.name] / total_weight)
+            break
+        for s in fits:
+            grants[s.name] = need[s.name]
+            remaining -= need[s.name]
+            pending.remove(s)
+
+    rendered, used = [], 0
+    for s in present:
+        text, tokens = s.render(grants[s.name])
+        rendered.append(text)
+        used += tokens
+    squeezed = [s.name for s in present if grants[s.name] < need[s.name]]
+    logger.info(
+        "Prompt %s: ~%d tokens of %d budget (needed ~%d)%s",
+        step, used, budget, sum(need.values()),
+        f", trimmed {', '.join(squeezed)}" if squeezed else "",
+    )
+    return "\n\n".join(rendered)
+
+
+def log_usage(step: str, response) -> None:
+    """Log the provider-reported token usage of an LLM response."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage:
+        logger.info(
+            "LLM usage %s: input=%s output=%s total=%s",
+            step, usage.get("input_tokens"), usage.get("output_tokens"), usage.get("total_tokens"),
+        )
@@ -0,0 +1,287 @@
+"""Redis-backed LangGraph checkpointer — lets interrupted investigations resume."""
+
+from __future__ import annotations
+
+import base64
+import json
+import logging
+from collections.abc import AsyncIterator, Sequence
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+
+from agent.config import settings
+from agent.queue.redis_client import CHECKPOINT_PREFIX, get_redis
+
+logger = logging.getLogger("agent.investigation.checkpoint")
+
+
+def _pack(typed: tuple[str, bytes]) -> list[str]:
+    # The shared client decodes responses as UTF-8, so binary payloads are base64'd
+    type_, data = typed
+    return [type_, base64.b64encode(data).decode()]
+
+
+def _unpack(packed: list[str]) -> tuple[str, bytes]:
+    type_, data = packed
+    return type_, base64.b64decode(data)
+
+
+class RedisCheckpointSaver(BaseCheckpointSaver):
+    """Stores graph checkpoints per thread (one thread per alert id) in Redis.
+
+    Layout, all keys expiring after ``checkpoint_ttl_seconds``:
+      ``sre:ckpt:<thread>:<ns>``             hash: checkpoint id -> checkpoint record
+      ``sre:ckpt:<thread>:<ns>:blobs``       hash: "<channel>:<version>" -> channel value
+      ``sre:ckpt:<thread>:<ns>:<id>:writes`` hash: "<task>:<idx>" -> pending write
+      ``sre:ckpt:<thread>``                  set of every key above, for deletion
+
+    Channel values are stored once per version, as LangGraph's own savers do,
+    so a node that doesn't touch ``evidence`` doesn't rewrite it. Only the
+    newest ``checkpoint_history`` checkpoints are kept; older ones, their
+    writes and the blobs nothing references any more are pruned on each put.
+    """
+
+    # ── Keys ────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _index_key(thread_id: str) -> str:
+        return f"{CHECKPOINT_PREFIX}{thread_id}"
+
+    @staticmethod
+    def _checkpoints_key(thread_id: str, ns: str) -> str:
+        return f"{CHECKPOINT_PREFIX}{thread_id}:{ns}"
+
+    @staticmethod
+    def _blobs_key(thread_id: str, ns: str) -> str:
+        return f"{CHECKPOINT_PREFIX}{thread_id}:{ns}:blobs"
+
+    @staticmethod
+    def _blob_field(channel: str, version: Any) -> str:
+        return f"{channel}:{version}"
+
+    @staticmethod
+    def _writes_key(thread_id: str, ns: str, checkpoint_id: str) -> str:
+        return f"{CHECKPOINT_PREFIX}{thread_id}:{ns}:{checkpoint_id}:writes"
+
+    def _touch(self, pipe, thread_id: str, *keys: str) -> None:
+        index = self._index_key(thread_id)
+        pipe.sadd(index, *keys)
+        for key in (index, *keys):
+            pipe.expire(key, settings.checkpoint_ttl_seconds)
+
+    # ── Read ────────────────────────────────────────────────────────
+
+    async def _load_tuple(
+        self, thread_id: str, ns: str, checkpoint_id: str, record: str
+    ) -> CheckpointTuple:
+        r = await get_redis()
+        saved = json.loads(record)
+        checkpoint = self.serde.loads_typed(_unpack(saved["checkpoint"]))
+        versions = checkpoint.get("channel_versions", {})
+        if versions:
+            fields = [self._blob_field(ch, ver) for ch, ver in versions.items()]
+            blobs = await r.hmget(self._blobs_key(thread_id, ns), fields)
+            values = dict(checkpoint.get("channel_values") or {})
+            for channel, blob in zip(versions, blobs):
+                if blob is None:
+                    continue
+                typed = _unpack(json.loads(blob))
+                if typed[0] != "empty":
+                    values[channel] = self.serde.loads_typed(typed)
+            checkpoint = {**checkpoint, "channel_values": values}
+        raw_writes = await r.hgetall(self._writes_key(thread_id, ns, checkpoint_id))
+        writes = sorted(
+            (json.loads(w) for w in raw_writes.values()),
+            key=lambda w: (w["task_id"], w["idx"]),
+        )
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": ns,
+                "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint=checkpoint,
+            metadata=self.serde.loads_typed(_unpack(saved["metadata"])),
+            parent_config=(
+                {"configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": ns,
+                    "checkpoint_id": saved["parent"],
+                }}
+                if saved.get("parent") else None
+            ),
+            pending_writes=[
+                (w["task_id"], w["channel"], self.serde.loads_typed(_unpack(w["value"])))
+                for w in writes
+            ],
+        )
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        r = await get_redis()
+        key = self._checkpoints_key(thread_id, ns)
+
+        checkpoint_id = get_checkpoint_id(config)
+        if not checkpoint_id:
+            ids = await r.hkeys(key)
+            if not ids:
+                return None
+            checkpoint_id = max(ids)  # checkpoint ids are time-ordered
+
+        record = await r.hget(key, checkpoint_id)
+        if record is None:
+            return None
+        return await self._load_tuple(thread_id, ns, checkpoint_id, record)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        if config is None:
+            raise ValueError("RedisCheckpointSaver.alist requires a thread_id")
+
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        only_id = get_checkpoint_id(config)
+        before_id = get_checkpoint_id(before) if before else None
+
+        r = await get_redis()
+        records = await r.hgetall(self._checkpoints_key(thread_id, ns))
+        for checkpoint_id in sorted(records, reverse=True):
+            if only_id and checkpoint_id != only_id:
+                continue
+            if before_id and checkpoint_id >= before_id:
+                continue
+            item = await self._load_tuple(thread_id, ns, checkpoint_id, records[checkpoint_id])
+            if filter and any(item.metadata.get(k) != v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            yield item
+
+    # ── Write ───────────────────────────────────────────────────────
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        key = self._checkpoints_key(thread_id, ns)
+        blobs_key = self._blobs_key(thread_id, ns)
+
+        # Only channels that changed in this step are written out
+        values = checkpoint.get("channel_values", {})
+        blobs = {
+            self._blob_field(channel, version): json.dumps(_pack(
+                self.serde.dumps_typed(values[channel]) if channel in values else ("empty", b"")
+            ))
+            for channel, version in new_versions.items()
+        }
+        record = json.dumps({
+            "checkpoint": _pack(self.serde.dumps_typed({**checkpoint, "channel_values": {}})),
+            "metadata": _pack(self.serde.dumps_typed(metadata)),
+            "parent": config["configurable"].get("checkpoint_id"),
+        })
+
+        r = await get_redis()
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.hset(key, checkpoint["id"], record)
+            if blobs:
+                pipe.hset(blobs_key, mapping=blobs)
+            self._touch(pipe, thread_id, key, blobs_key)
+            await pipe.execute()
+        await self._prune(thread_id, ns)
+
+        return {"configurable": {
+            "thread_id": thread_id,
+            "checkpoint_ns": ns,
+            "checkpoint_id": checkpoint["id"],
+        }}
+
+    async def _prune(self, thread_id: str, ns: str) -> None:
+        """Drop checkpoints beyond ``checkpoint_history``, their writes and orphaned blobs."""
+        r = await get_redis()
+        key = self._checkpoints_key(thread_id, ns)
+        ids = sorted(await r.hkeys(key))
+        keep = max(settings.checkpoint_history, 1)
+        stale = ids[:-keep]
+        if not stale:
+            return
+
+        referenced = set()
+        for record in await r.hmget(key, ids[-keep:]):
+            if record is None:
+                continue
+            saved = self.serde.loads_typed(_unpack(json.loads(record)["checkpoint"]))
+            referenced.update(
+                self._blob_field(ch, ver) for ch, ver in saved.get("channel_versions", {}).items()
+            )
+        blobs_key = self._blobs_key(thread_id, ns)
+        orphaned = [f for f in await r.hkeys(blobs_key) if f not in referenced]
+        writes = [self._writes_key(thread_id, ns, checkpoint_id) for checkpoint_id in stale]
+
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.hdel(key, *stale)
+            if orphaned:
+                pipe.hdel(blobs_key, *orphaned)
+            pipe.delete(*writes)
+            pipe.srem(self._index_key(thread_id), *writes)
+            await pipe.execute()
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        key = self._writes_key(thread_id, ns, config["configurable"]["checkpoint_id"])
+
+        r = await get_redis()
+        async with r.pipeline(transaction=True) as pipe:
+            for idx, (channel, value) in enumerate(writes):
+                write_idx = WRITES_IDX_MAP.get(channel, idx)
+                record = json.dumps({
+                    "task_id": task_id,
+                    "idx": write_idx,
+                    "channel": channel,
+                    "value": _pack(self.serde.dumps_typed(value)),
+                    "task_path": task_path,
+                })
+                field = f"{task_id}:{write_idx}"
+                # Special writes (errors, interrupts) overwrite; regular ones are write-once
+                if write_idx < 0:
+                    pipe.hset(key, field, record)
+                else:
+                    pipe.hsetnx(key, field, record)
+            self._touch(pipe, thread_id, key)
+            await pipe.execute()
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        r = await get_redis()
+        index = self._index_key(thread_id)
+        keys = await r.smembers(index)
+        await r.delete(index, *keys)
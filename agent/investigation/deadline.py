@@ -0,0 +1,36 @@
+"""Investigation deadlines — wall-clock cutoffs carried in state and in context.
+
+The deadline lives in ``InvestigationState`` (epoch seconds, so it survives a
+checkpoint) and is mirrored into a context variable while a node runs, which
+lets backend calls far below the graph shrink their budgets to fit.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_deadline: ContextVar[float | None] = ContextVar("investigation_deadline", default=None)
+
+
+def remaining() -> float | None:
+    """Seconds until the current context's deadline, or None when unbounded."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.time()
+
+
+def time_left(deadline: float | None) -> float:
+    return math.inf if deadline is None else deadline - time.time()
+
+
+@contextmanager
+def deadline_scope(deadline: float | None) -> Iterator[None]:
+    """Make ``deadline`` visible to backend calls made inside the block."""
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
@@ -0,0 +1,175 @@
+"""Evidence digests — compact statistical summaries of metric series for LLM prompts.
+
+Raw Prometheus matrices are mostly redundant to a reader: a few numbers per
+series (range, level, trend, where it shifted and when it first left its
+baseline) carry what the hypothesis ranker and RCA writer actually use, and
+for traces the critical-path analysis stands in for the span lists. The
+raw evidence stays in the investigation state and the saved report; only the
+prompts see the digest.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger("agent.investigation")
+
+_MAX_CHANGE_POINTS = 3
+_MIN_SEGMENT = 3
+_CHANGE_SCORE = 3.0  # mean shift, in noise standard deviations
+_BASELINE_SIGMAS = 3.0
+_MAX_ERROR_SPANS = 10
+# Executor fields that only matter for re-run decisions, not to the model
+_BOOKKEEPING = ("fetched_at", "final", "iteration")
+
+
+def _round(x: float) -> float:
+    return float(f"{x:.4g}")
+
+
+def _series_arrays(values: list) -> tuple[np.ndarray, np.ndarray]:
+    if not values:
+        return np.empty(0), np.empty(0)
+    raw = np.asarray(values, dtype=object)
+    ts = raw[:, 0].astype(float)
+    ys = np.array([float(v) if v not in (None, "") else np.nan for v in raw[:, 1]])
+    keep = np.isfinite(ys)
+    return ts[keep], ys[keep]
+
+
+def _best_split(ys: np.ndarray) -> tuple[int, float]:
+    """Index and score of the single mean shift that best splits ``ys``."""
+    n = len(ys)
+    k = np.arange(_MIN_SEGMENT, n - _MIN_SEGMENT + 1)
+    if k.size == 0:
+        return -1, 0.0
+    csum = np.concatenate(([0.0], np.cumsum(ys)))
+    left = csum[k] / k
+    right = (csum[n] - csum[k]) / (n - k)
+    # Noise from first differences is robust to the shift we're looking for
+    noise = np.median(np.abs(np.diff(ys))) / 0.6745 / np.sqrt(2) if n > 1 else 0.0
+    noise = max(noise, 1e-9 * max(np.abs(ys).max(), 1.0))
+    score = np.abs(left - right) / (noise * np.sqrt(1.0 / k + 1.0 / (n - k)))
+    best = int(np.argmax(score))
+    return int(k[best]), float(score[best])
+
+
+def _change_points(ts: np.ndarray, ys: np.ndarray, alert_ts: float) -> list[dict]:
+    """Binary segmentation on mean shifts, strongest first."""
+    found: list[tuple[float, int]] = []
+    segments = [(0, len(ys))]
+    while segments and len(found) < _MAX_CHANGE_POINTS:
+        lo, hi = segments.pop()
+        split, score = _best_split(ys[lo:hi])
+        if split < 0 or score < _CHANGE_SCORE:
+            continue
+        found.append((score, lo + split))
+        segments.extend([(lo, lo + split), (lo + split, hi)])
+    points = []
+    for _, i in sorted(found, key=lambda f: f[1]):
+        before = ys[max(0, i - _MIN_SEGMENT * 2):i]
+        after = ys[i:i + _MIN_SEGMENT * 2]
+        points.append({
+            "t_rel_s": int(ts[i] - alert_ts),
+            "before": _round(before.mean()),
+            "after": _round(after.mean()),
+        })
+    return points
+
+
+def _first_crossing(ts: np.ndarray, ys: np.ndarray, alert_ts: float) -> dict | None:
+    """First point outside the baseline band (first third of the window)."""
+    n_base = max(len(ys) // 3, _MIN_SEGMENT)
+    if len(ys) <= n_base:
+        return None
+    base = ys[:n_base]
+    mean = base.mean()
+    band = _BASELINE_SIGMAS * max(base.std(), abs(mean) * 0.05, 1e-9)
+    outside = np.flatnonzero(np.abs(ys[n_base:] - mean) > band)
+    if outside.size == 0:
+        return None
+    i = n_base + int(outside[0])
+    return {
+        "t_rel_s": int(ts[i] - alert_ts),
+        "direction": "up" if ys[i] > mean else "down",
+        "baseline": _round(mean),
+        "value": _round(ys[i]),
+    }
+
+
+def digest_series(values: list, alert_ts: float) -> dict:
+    """Summarize one ``[[ts, "value"], ...]`` series.
+
+    Times are seconds relative to the alert start (negative = before it).
+    """
+    ts, ys = _series_arrays(values)
+    if ys.size == 0:
+        return {"points": 0}
+    digest = {
+        "points": int(ys.size),
+        "min": _round(ys.min()),
+        "max": _round(ys.max()),
+        "mean": _round(ys.mean()),
+        "p95": _round(np.percentile(ys, 95)),
+        "last": _round(ys[-1]),
+    }
+    if ys.size > 1 and ts[-1] > ts[0]:
+        slope = np.polyfit(ts - ts[0], ys, 1)[0]
+        digest["slope_per_min"] = _round(slope * 60)
+    digest["change_points"] = _change_points(ts, ys, alert_ts)
+    digest["first_crossing"] = _first_crossing(ts, ys, alert_ts)
+    return digest
+
+
+def digest_traces(result: dict) -> dict:
+    """Tempo evidence without span lists: the trace analysis plus error spans only."""
+    compact = {k: v for k, v in result.items() if k not in ("traces", "full_traces")}
+    compact["error_spans"] = [
+        {"trace_id": t.get("trace_id"), **span}
+        for t in result.get("full_traces", [])
+        for span in t.get("spans", [])
+        if span.get("error")
+    ][:_MAX_ERROR_SPANS]
+    return compact
+
+
+def digest_evidence(entry: dict, alert_time: datetime) -> dict:
+    """Replace a Prometheus (or LogQL metric) matrix in an evidence entry with per-series digests.
+
+    Tempo results with a trace analysis lose their span dumps the same way.
+    """
+    result = entry.get("result")
+    if not isinstance(result, dict):
+        return entry
+    if entry.get("tool") == "tempo" and "analysis" in result:
+        return {**entry, "result": digest_traces(result)}
+    if entry.get("tool") not in ("prometheus", "loki"):
+        return entry
+    if result.get("result_type") != "matrix":
+        return entry
+    alert_ts = alert_time.timestamp()
+    compact = {k: v for k, v in result.items() if k != "result"}
+    compact["series"] = [
+        {"metric": s.get("metric", {}), **digest_series(s.get("values", []), alert_ts)}
+        for s in result.get("result", [])
+    ]
+    return {**entry, "result": compact}
+
+
+def compact_evidence(evidence: list[dict], alert_time: datetime) -> list[dict]:
+    """Prompt-ready evidence: metric matrices and traces digested, everything else as-is.
+
+    Executor bookkeeping is dropped; ``cache_key`` stays so ``result_ref``s resolve.
+    """
+    out = []
+    for entry in evidence:
+        entry = {k: v for k, v in entry.items() if k not in _BOOKKEEPING}
+        try:
+            out.append(digest_evidence(entry, alert_time))
+        except Exception:
+            logger.warning("Could not digest evidence for %s", entry.get("query"), exc_info=True)
+            out.append(entry)
+    return out
@@ -2,18 +2,37 @@
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
+import time
 from datetime import datetime, timedelta, timezone
+from typing import Callable
 
 from agent.config import settings
 from agent.hypothesis.models import Hypothesis, InvestigationQuery
-from agent.investigation.tools.loki import LokiClient
+from agent.investigation.tools.loki import LokiClient, run_mode
 from agent.investigation.tools.prometheus import PrometheusClient
+from agent.investigation.state import evidence_failed
+from agent.investigation.tools.resilience import BackendUnavailable
 from agent.investigation.tools.tempo import TempoClient
 
 logger = logging.getLogger("agent.investigation")
 
 
+def query_cache_key(
+    tool: str, query: str, start: datetime, end: datetime, step: str = "", mode: str = "",
+) -> str:
+    """Identity of a backend query: tool, whitespace-normalized query, window, step and mode.
+
+    ``mode`` distinguishes executions of the same query text that return
+    different results, e.g. a Loki selector counted vs. read and mined.
+    """
+    normalized = " ".join(query.split())
+    raw = f"{tool}|{normalized}|{int(start.timestamp())}|{int(end.timestamp())}|{step}|{mode}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
 class InvestigationExecutor:
     """Executes the query plan for a set of hypotheses against live backends."""
 
@@ -22,34 +41,87 @@ class InvestigationExecutor:
         prometheus: PrometheusClient,
         loki: LokiClient,
         tempo: TempoClient,
+        on_query: Callable[[str, float, bool], None] | None = None,
     ) -> None:
         self._prometheus = prometheus
         self._loki = loki
         self._tempo = tempo
+        # Called with (tool, latency seconds, ok) after every backend query
+        self._on_query = on_query
+        # Independent caps so a wide plan cannot flood a single backend
+        self._limits = {
+            "prometheus": asyncio.Semaphore(settings.prometheus_max_concurrency),
+            "loki": asyncio.Semaphore(settings.loki_max_concurrency),
+            "tempo": asyncio.Semaphore(settings.tempo_max_concurrency),
+        }
 
     async def execute_query(
         self, query: InvestigationQuery, alert_time: datetime
     ) -> dict:
-        """Execute a single investigation query against the appropriate backend."""
+        """Execute a single investigation query, waiting for a slot on its backend."""
+        limit = self._limits.get(query.tool)
+        if limit is None:
+            return {"tool": query.tool, "error": f"Unknown tool: {query.tool}"}
+        async with limit:
+            return await self._run_query(query, alert_time)
+
+    @staticmethod
+    def _window(alert_time: datetime) -> tuple[datetime, datetime]:
         start = alert_time - timedelta(minutes=settings.query_lookback_minutes)
         end = alert_time + timedelta(minutes=settings.query_lookahead_minutes)
+        return start, end
+
+    def cache_key(self, query: InvestigationQuery, alert_time: datetime) -> str:
+        start, end = self._window(alert_time)
+        step = self._prometheus.step_for(start, end) if query.tool == "prometheus" else ""
+        mode = run_mode(query.query, query.purpose) if query.tool == "loki" else ""
+        return query_cache_key(query.tool, query.query, start, end, step, mode)
+
+    @staticmethod
+    def settled_keys(evidence: list[dict]) -> set[str]:
+        """Keys of results that needn't be re-run: closed windows, or refreshed recently.
+
+        Open-window results are not memoized for the whole investigation —
+        once ``evidence_refresh_seconds`` old they are queried again.
+        """
+        now = time.time()
+        return {
+            e["cache_key"] for e in evidence
+            if e.get("cache_key") and "result_ref" not in e and not evidence_failed(e)
+            and (e.get("final") or now - e.get("fetched_at", 0) < settings.evidence_refresh_seconds)
+        }
 
+    async def _run_query(self, query: InvestigationQuery, alert_time: datetime) -> dict:
+        start, end = self._window(alert_time)
+
+        started = time.monotonic()
+        ok = False
         try:
             if query.tool == "prometheus":
-                result = await self._prometheus.range_query(query.query, start=start, end=end)
+                result = await self._prometheus.range_query(
+                    query.query, start=start, end=end, step=self._prometheus.step_for(start, end),
+                )
             elif query.tool == "loki":
-                result = await self._loki.query_range(query.query, start=start, end=end)
-            elif query.tool == "tempo":
-                result = await self._tempo.search(tags=query.query, start=start, end=end)
+                result = await self._loki.run(query.query, start, end, purpose=query.purpose)
             else:
-                return {"tool": query.tool, "error": f"Unknown tool: {query.tool}"}
+                result = await self._tempo.search_traces(query.query, start=start, end=end)
 
+            ok = result.get("status") != "error"
             return {
                 "tool": query.tool,
                 "query": query.query,
                 "purpose": query.purpose,
                 "result": result,
             }
+        except BackendUnavailable as exc:
+            logger.warning("Query skipped: %s", exc)
+            return {
+                "tool": query.tool,
+                "query": query.query,
+                "purpose": query.purpose,
+                "status": "unavailable",
+                "error": str(exc),
+            }
         except Exception as exc:
             logger.exception("Query execution failed: %s %s", query.tool, query.query)
             return {
@@ -58,31 +130,81 @@ class InvestigationExecutor:
                 "purpose": query.purpose,
                 "error": str(exc),
             }
+        finally:
+            if self._on_query:
+                self._on_query(query.tool, time.monotonic() - started, ok)
 
     async def execute_hypothesis_queries(
         self, hypothesis: Hypothesis, alert_time: datetime
     ) -> list[dict]:
-        """Execute all queries for a hypothesis and return the evidence."""
-        evidence = []
-        for query in hypothesis.queries:
-            result = await self.execute_query(query, alert_time)
+        """Execute all queries for a hypothesis concurrently and return the evidence in plan order."""
+        evidence = await asyncio.gather(*(
+            self.execute_query(query, alert_time) for query in hypothesis.queries
+        ))
+        for result in evidence:
             result["hypothesis_id"] = hypothesis.id
-            evidence.append(result)
 
         logger.info(
             "Executed %d queries for hypothesis '%s'",
             len(evidence),
             hypothesis.title,
         )
-        return evidence
+        return list(evidence)
 
     async def execute_all(
-        self, hypotheses: list[Hypothesis], alert_time: datetime
+        self,
+        hypotheses: list[Hypothesis],
+        alert_time: datetime,
+        known_keys: set[str] | None = None,
     ) -> list[dict]:
-        """Execute queries for all pending hypotheses."""
-        all_evidence = []
+        """Execute queries for all pending hypotheses at once, bounded per backend.
+
+        Queries whose ``cache_key`` is in ``known_keys`` (see ``settled_keys``)
+        are skipped, and a query shared by several hypotheses runs once — later
+        occurrences get a ``result_ref`` entry pointing at the first instead of
+        a second copy of the payload (failures are small and copied inline).
+        Every entry carries its ``cache_key`` and ``fetched_at``; results for a
+        window that has fully elapsed are also marked ``final``.
+        """
+        known = known_keys or set()
+        _, end = self._window(alert_time)
+        final = end <= datetime.now(timezone.utc)
+        fetched_at = time.time()
+
+        tasks: dict[str, asyncio.Task] = {}
+        plan: list[tuple[Hypothesis, InvestigationQuery, str, bool]] = []
+        skipped = 0
         for h in hypotheses:
-            if h.status.value in ("pending", "investigating"):
-                results = await self.execute_hypothesis_queries(h, alert_time)
-                all_evidence.extend(results)
-        return all_evidence
+            if h.status.value not in ("pending", "investigating"):
+                continue
+            for query in h.queries:
+                key = self.cache_key(query, alert_time)
+                if key in known:
+                    skipped += 1
+                    continue
+                first = key not in tasks
+                if first:
+                    tasks[key] = asyncio.ensure_future(self.execute_query(query, alert_time))
+                plan.append((h, query, key, first))
+
+        if tasks:
+            await asyncio.gather(*tasks.values())
+
+        evidence = []
+        for h, query, key, first in plan:
+            outcome = tasks[key].result()
+            entry = {"tool": query.tool, "query": query.query, "purpose": query.purpose}
+            if first or evidence_failed(outcome):
+                entry = {**outcome, **entry}
+            else:
+                entry["result_ref"] = key
+            entry.update(hypothesis_id=h.id, cache_key=key, fetched_at=fetched_at)
+            if final:
+                entry["final"] = True
+            evidence.append(entry)
+
+        logger.info(
+            "Executed %d queries (%d planned, %d already in evidence)",
+            len(tasks), len(plan) + skipped, skipped,
+        )
+        return evidence
@@ -2,20 +2,26 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
 from typing import Literal
 
 from langchain_core.language_models import BaseChatModel
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import END, StateGraph
 
+from agent.config import settings
 from agent.enrichment.context import ContextBuilder
 from agent.framing.framer import frame_problem
 from agent.hypothesis.generator import generate_hypotheses
 from agent.hypothesis.models import HypothesisStatus
 from agent.hypothesis.ranker import rerank_hypotheses
+from agent.investigation.deadline import deadline_scope, time_left
+from agent.investigation.digest import compact_evidence
 from agent.investigation.executor import InvestigationExecutor
 from agent.investigation.state import InvestigationState
-from agent.reporting.rca import generate_rca_report
+from agent.reporting.rca import build_partial_report, generate_rca_report
 
 logger = logging.getLogger("agent.investigation")
 
@@ -27,11 +33,40 @@ def build_investigation_graph(
 ) -> StateGraph:
     """Construct the LangGraph state machine for alert investigation."""
 
+    # ── Deadline helpers ────────────────────────────────────────────
+
+    def work_left(state: InvestigationState) -> float:
+        """Time left for anything but the final report."""
+        return time_left(state.get("deadline")) - settings.report_reserve_seconds
+
+    async def within_deadline(state: InvestigationState, coro):
+        """Await an LLM step, giving up (None) once only the report reserve is left."""
+        left = work_left(state)
+        if left <= 0:
+            coro.close()
+            return None
+        try:
+            return await asyncio.wait_for(coro, timeout=left if left != float("inf") else None)
+        except asyncio.TimeoutError:
+            logger.warning("Investigation deadline reached for alert=%s", state["alert"].id)
+            return None
+
+    def out_of_time(state: InvestigationState) -> bool:
+        """Deadline hit, or the next iteration likely can't finish before it."""
+        if state.get("deadline_exceeded") or work_left(state) <= 0:
+            return True
+        return work_left(state) < state.get("last_iteration_seconds", 0)
+
+    def work_scope(state: InvestigationState):
+        deadline = state.get("deadline")
+        return deadline_scope(deadline - settings.report_reserve_seconds if deadline else None)
+
     # ── Node functions ──────────────────────────────────────────────
 
     async def enrich_context(state: InvestigationState) -> dict:
         alert = state["alert"]
-        ctx = await context_builder.build(alert)
+        with work_scope(state):
+            ctx = await context_builder.build(alert)
         return {
             "context": ctx,
             "runbook_context": ctx.get("runbook_context", []),
@@ -42,59 +77,138 @@ def build_investigation_graph(
         }
 
     async def frame(state: InvestigationState) -> dict:
-        pf = await frame_problem(llm, state["context"])
+        pf = await within_deadline(state, frame_problem(llm, state["context"]))
+        if pf is None:
+            return {"deadline_exceeded": True}
         return {"problem_frame": pf}
 
     async def hypothesize(state: InvestigationState) -> dict:
-        hyps = await generate_hypotheses(llm, state["problem_frame"], state["context"])
+        hyps = await within_deadline(state, generate_hypotheses(llm, state["problem_frame"], state["context"]))
+        if hyps is None:
+            return {"deadline_exceeded": True}
         return {"hypotheses": hyps}
 
     async def investigate(state: InvestigationState) -> dict:
+        started = time.time()
         alert_time = state["alert"].starts_at
-        evidence = await executor.execute_all(state["hypotheses"], alert_time)
+        known = executor.settled_keys(state.get("evidence", []))
+        with work_scope(state):
+            evidence = await executor.execute_all(state["hypotheses"], alert_time, known_keys=known)
         iteration = state.get("iteration", 0) + 1
-        return {"evidence": evidence, "iteration": iteration}
+        for entry in evidence:
+            entry["iteration"] = iteration
+        update = {"evidence": evidence, "iteration": iteration, "iteration_started_at": started}
+        if not evidence:
+            # Nothing new to look at — another rerank would only repeat the last one
+            update["stop_reason"] = "no_new_evidence"
+        return update
 
     async def analyze(state: InvestigationState) -> dict:
-        updated = await rerank_hypotheses(llm, state["hypotheses"], state["evidence"])
+        # Earlier evidence is already folded into each hypothesis's assessment
+        analyzed = state.get("analyzed_iteration", 0)
+        fresh = [e for e in state["evidence"] if e.get("iteration", 0) > analyzed]
+        evidence = compact_evidence(fresh, state["alert"].starts_at)
+        updated = await within_deadline(state, rerank_hypotheses(llm, state["hypotheses"], evidence))
+        elapsed = time.time() - state.get("iteration_started_at", time.time())
+        if updated is None:
+            return {"deadline_exceeded": True, "last_iteration_seconds": elapsed}
 
         confirmed = [h for h in updated if h.status == HypothesisStatus.CONFIRMED]
         best = max(updated, key=lambda h: h.likelihood) if updated else None
         confidence = best.likelihood if best else 0.0
 
+        # Convergence: likelihoods barely moved and the top of the ranking held
+        previous = state.get("likelihoods", {})
+        likelihoods = {h.id: h.likelihood for h in updated}
+        ranking = [h.id for h in updated[:3]]
+        stable = bool(previous) and likelihoods.keys() == previous.keys() and ranking == state.get("ranking") and all(
+            abs(likelihoods[k] - previous[k]) < settings.convergence_delta for k in likelihoods
+        )
+        stable_rounds = state.get("stable_rounds", 0) + 1 if stable else 0
+
+        if confirmed:
+            stop_reason = "confirmed"
+        elif confidence >= settings.confidence_threshold:
+            stop_reason = "confidence_threshold"
+        elif stable_rounds >= settings.convergence_patience:
+            stop_reason = "converged"
+        elif state.get("iteration", 0) >= state.get("max_iterations", 6):
+            stop_reason = "max_iterations"
+        else:
+            stop_reason = ""
+
         return {
             "hypotheses": updated,
+            "analyzed_iteration": state.get("iteration", 0),
             "root_cause_found": len(confirmed) > 0,
             "confidence": confidence,
+            "last_iteration_seconds": elapsed,
+            "likelihoods": likelihoods,
+            "ranking": ranking,
+            "stable_rounds": stable_rounds,
+            "stop_reason": stop_reason,
         }
 
+    async def write_report(state: InvestigationState, partial_reason: str) -> dict:
+        """LLM report within whatever time is left, else one built from state alone."""
+        left = time_left(state.get("deadline"))
+        if left > 0:
+            try:
+                return await asyncio.wait_for(
+                    generate_rca_report(llm, state),
+                    timeout=left if left != float("inf") else None,
+                )
+            except asyncio.TimeoutError:
+                logger.warning("RCA report generation ran past the deadline for alert=%s", state["alert"].id)
+            except Exception:
+                logger.exception("RCA report generation failed for alert=%s", state["alert"].id)
+        return build_partial_report(state, partial_reason)
+
     async def report(state: InvestigationState) -> dict:
-        rca = await generate_rca_report(llm, state)
+        rca = await write_report(state, "Root cause confirmed but the report ran out of time")
         return {"rca_report": rca, "status": "resolved"}
 
     async def escalate(state: InvestigationState) -> dict:
-        logger.warning(
-            "Investigation escalated — confidence=%.2f after %d iterations",
-            state.get("confidence", 0),
-            state.get("iteration", 0),
-        )
-        rca = await generate_rca_report(llm, state)
+        stop_reason = state.get("stop_reason") or ""
+        if state.get("deadline_exceeded") or (not stop_reason and out_of_time(state)):
+            stop_reason = "deadline"
+        confidence = state.get("confidence", 0)
+        iterations = state.get("iteration", 0)
+        reason = {
+            "deadline": f"Investigation deadline reached after {iterations} iterations at confidence {confidence:.0%}",
+            "converged": f"Hypothesis likelihoods stopped changing at confidence {confidence:.0%} after {iterations} iterations",
+            "no_new_evidence": f"No new evidence left to gather after {iterations} iterations at confidence {confidence:.0%}",
+        }.get(stop_reason, f"Confidence {confidence:.0%} below threshold after {iterations} iterations")
+        logger.warning("Investigation escalated — %s", reason)
+
+        state = {**state, "stop_reason": stop_reason or "max_iterations"}
+        rca = await write_report(state, reason)
         rca["escalated"] = True
-        rca["escalation_reason"] = (
-            f"Confidence {state.get('confidence', 0):.0%} below threshold after "
-            f"{state.get('iteration', 0)} iterations"
-        )
-        return {"rca_report": rca, "status": "escalated"}
+        rca["escalation_reason"] = reason
+        return {"rca_report": rca, "status": "escalated", "stop_reason": state["stop_reason"]}
 
     # ── Routing logic ───────────────────────────────────────────────
 
+    def proceed_to(node: str):
+        def route(state: InvestigationState) -> str:
+            if state.get("stop_reason") or state.get("deadline_exceeded") or work_left(state) <= 0:
+                return "escalate"
+            return node
+        return route
+
     def should_continue(state: InvestigationState) -> Literal["report", "investigate", "escalate"]:
-        if state.get("root_cause_found"):
+        stop_reason = state.get("stop_reason")
+        if stop_reason in ("confirmed", "confidence_threshold"):
             return "report"
+        if stop_reason or state.get("deadline_exceeded"):
+            return "escalate"
 
-        iteration = state.get("iteration", 0)
-        max_iter = state.get("max_iterations", 6)
-        if iteration >= max_iter:
+        # Don't start an iteration that likely can't finish before the deadline
+        if out_of_time(state):
+            logger.info(
+                "Skipping further iterations for alert=%s — %.0fs left, last iteration took %.0fs",
+                state["alert"].id, work_left(state), state.get("last_iteration_seconds", 0),
+            )
             return "escalate"
 
         return "investigate"
@@ -112,10 +226,13 @@ def build_investigation_graph(
     graph.add_node("escalate", escalate)
 
     graph.set_entry_point("enrich_context")
-    graph.add_edge("enrich_context", "frame")
-    graph.add_edge("frame", "hypothesize")
-    graph.add_edge("hypothesize", "investigate")
-    graph.add_edge("investigate", "analyze")
+    for node, after in (
+        ("enrich_context", "frame"),
+        ("frame", "hypothesize"),
+        ("hypothesize", "investigate"),
+        ("investigate", "analyze"),
+    ):
+        graph.add_conditional_edges(node, proceed_to(after), {after: after, "escalate": "escalate"})
 
     graph.add_conditional_edges("analyze", should_continue, {
         "report": "report",
@@ -133,7 +250,13 @@ def compile_investigation_graph(
     llm: BaseChatModel,
     context_builder: ContextBuilder,
     executor: InvestigationExecutor,
+    checkpointer: BaseCheckpointSaver | None = None,
 ):
-    """Build and compile the investigation graph, ready to invoke."""
+    """Build and compile the investigation graph, ready to invoke.
+
+    With a checkpointer, state is saved after every node under the
+    ``thread_id`` passed in the run config, so a retried run resumes from the
+    last completed node instead of repeating paid LLM calls.
+    """
     graph = build_investigation_graph(llm, context_builder, executor)
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
@@ -0,0 +1,153 @@
+"""LLM response cache — in-process LRU with an optional Redis tier.
+
+Plugged into the chat model as its LangChain ``cache``, so every
+``llm.ainvoke`` (framing, hypotheses, reranking, RCA) is looked up by the
+model's parameters (model, temperature, ...) and the exact prompt messages.
+Re-delivered alerts, manual re-triggers and flapping alerts that rebuild a
+byte-identical prompt get the earlier answer without a model call — prompts
+carry only the alert's stable fields (see ``alert_for_prompt``) so that they do.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Any
+
+from langchain_core.caches import BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+from agent.config import settings
+from agent.queue.redis_client import LLM_CACHE_PREFIX, get_redis
+
+logger = logging.getLogger("agent.investigation")
+
+
+def _key(prompt: str, llm_string: str) -> str:
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode()).hexdigest()
+
+
+def _encode(generations: Sequence[Generation]) -> str:
+    out = []
+    for g in generations:
+        item: dict[str, Any] = {"text": g.text, "generation_info": g.generation_info}
+        if isinstance(g, ChatGeneration):
+            item["message"] = message_to_dict(g.message)
+        out.append(item)
+    return json.dumps(out, default=str)
+
+
+def _served(generations: list[Generation]) -> list[Generation]:
+    """Copies marked ``cached`` so callbacks can tell them from real model calls."""
+    return [
+        g.model_copy(update={"generation_info": {**(g.generation_info or {}), "cached": True}})
+        for g in generations
+    ]
+
+
+def _decode(raw: str) -> list[Generation]:
+    generations: list[Generation] = []
+    for item in json.loads(raw):
+        if "message" in item:
+            message = messages_from_dict([item["message"]])[0]
+            generations.append(ChatGeneration(message=message, generation_info=item.get("generation_info")))
+        else:
+            generations.append(Generation(text=item["text"], generation_info=item.get("generation_info")))
+    return generations
+
+
+class LLMResponseCache(BaseCache):
+    """Prompt-keyed cache of model generations with TTLs and hit/miss counters."""
+
+    def __init__(self, max_entries: int | None = None, ttl_seconds: int | None = None) -> None:
+        self._max_entries = max_entries or settings.llm_cache_size
+        self._ttl = ttl_seconds or settings.llm_cache_ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, list[Generation]]] = OrderedDict()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    # ── In-process tier ─────────────────────────────────────────────
+
+    def _get_local(self, key: str) -> list[Generation] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, generations = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return generations
+
+    def _put_local(self, key: str, generations: list[Generation]) -> None:
+        self._entries[key] = (time.monotonic() + self._ttl, generations)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    # ── BaseCache ───────────────────────────────────────────────────
+
+    def lookup(self, prompt: str, llm_string: str) -> Sequence[Generation] | None:
+        generations = self._get_local(_key(prompt, llm_string))
+        if generations is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return _served(generations)
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        self._put_local(_key(prompt, llm_string), list(return_val))
+
+    def clear(self, **kwargs: Any) -> None:
+        self._entries.clear()
+
+    async def alookup(self, prompt: str, llm_string: str) -> Sequence[Generation] | None:
+        key = _key(prompt, llm_string)
+        generations = self._get_local(key)
+        if generations is not None:
+            self.hits += 1
+            return _served(generations)
+        if settings.llm_cache_redis:
+            try:
+                r = await get_redis()
+                raw = await r.get(f"{LLM_CACHE_PREFIX}{key}")
+            except Exception:
+                logger.warning("LLM cache read failed", exc_info=True)
+                raw = None
+            if raw is not None:
+                generations = _decode(raw)
+                self._put_local(key, generations)
+                self.hits += 1
+                self.redis_hits += 1
+                return _served(generations)
+        self.misses += 1
+        return None
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        key = _key(prompt, llm_string)
+        self._put_local(key, list(return_val))
+        if settings.llm_cache_redis:
+            try:
+                r = await get_redis()
+                await r.set(f"{LLM_CACHE_PREFIX}{key}", _encode(return_val), ex=self._ttl)
+            except Exception:
+                logger.warning("LLM cache write failed", exc_info=True)
+
+    async def aclear(self, **kwargs: Any) -> None:
+        self.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+        }
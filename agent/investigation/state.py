@@ -9,8 +9,25 @@ from agent.hypothesis.models import Hypothesis
 from agent.ingestion.models import NormalizedAlert
 
 
-def _merge_lists(left: list, right: list) -> list:
-    return left + right
+def evidence_failed(entry: dict) -> bool:
+    """Whether an evidence entry records a failed or skipped query rather than a result."""
+    return "error" in entry or entry.get("result", {}).get("status") == "error"
+
+
+def _merge_evidence(left: list[dict], right: list[dict]) -> list[dict]:
+    """Append new evidence, superseding earlier entries for re-run queries.
+
+    A successful result for a ``cache_key`` replaces every earlier entry with
+    that key (payload and ``result_ref``s); a failure only replaces earlier
+    failures, so a good result is never lost to a failed refresh.
+    """
+    refreshed = {e["cache_key"] for e in right if e.get("cache_key") and "result_ref" not in e and not evidence_failed(e)}
+    retried = {e["cache_key"] for e in right if e.get("cache_key")}
+    kept = [
+        e for e in left
+        if not (e.get("cache_key") in refreshed or (evidence_failed(e) and e.get("cache_key") in retried))
+    ]
+    return kept + right
 
 
 class InvestigationState(TypedDict, total=False):
@@ -30,13 +47,22 @@ class InvestigationState(TypedDict, total=False):
     hypotheses: list[Hypothesis]
 
     # Investigation
-    evidence: Annotated[list[dict], _merge_lists]
+    evidence: Annotated[list[dict], _merge_evidence]
+    analyzed_iteration: int  # evidence from iterations up to this is reflected in the hypotheses
     iteration: int
     max_iterations: int
+    deadline: float  # epoch seconds; the graph escalates with a partial report before it
+    deadline_exceeded: bool
+    iteration_started_at: float
+    last_iteration_seconds: float
 
     # Analysis
     root_cause_found: bool
     confidence: float
+    likelihoods: dict[str, float]  # previous round, for convergence checks
+    ranking: list[str]
+    stable_rounds: int
+    stop_reason: str  # confirmed / confidence_threshold / converged / no_new_evidence / max_iterations / deadline
 
     # Output
     rca_report: dict
@@ -0,0 +1,181 @@
+"""Shared backend query cache — singleflight in-process, results cached in Redis.
+
+Concurrent investigations (and the enrichment correlator) tend to issue the
+same queries over nearly the same windows. Clients bucket their window bounds
+with ``bucket_window`` so those requests become byte-identical, then route
+them through one ``QueryCache``: identical in-flight requests share a single
+backend call, and successful responses are kept in Redis for a TTL that
+depends on whether the window is still open.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+
+import httpx
+
+from agent.config import settings
+from agent.investigation.tools.http import decode_json, dumps, loads
+from agent.investigation.deadline import deadline_scope, remaining
+from agent.investigation.tools.resilience import BackendGuard, BackendUnavailable
+from agent.queue.redis_client import QUERY_CACHE_PREFIX, get_redis
+
+logger = logging.getLogger("agent.investigation.tools")
+
+
+def bucket_window(start: datetime, end: datetime) -> tuple[datetime, datetime]:
+    """Widen a window outward to cache-bucket boundaries."""
+    size = settings.query_cache_bucket_seconds
+    if size <= 0:
+        return start, end
+    lo = math.floor(start.timestamp() / size) * size
+    hi = math.ceil(end.timestamp() / size) * size
+    return datetime.fromtimestamp(lo, timezone.utc), datetime.fromtimestamp(hi, timezone.utc)
+
+
+def _body(resp: httpx.Response) -> dict:
+    # Error responses (Loki/Tempo 400 for a malformed query, Tempo 404 for an
+    # unknown trace) are often plain text — keep it as the error message
+    if resp.status_code != 200:
+        try:
+            body = decode_json(resp)
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            return {"status": "error", "error": resp.text.strip()[:500] or f"HTTP {resp.status_code}"}
+        return body
+    return decode_json(resp)
+
+
+def response_error(status_code: int, body: dict) -> str | None:
+    """The error a backend reported, or None for a successful response."""
+    if status_code == 200 and body.get("status") != "error":
+        return None
+    return str(body.get("error") or body.get("message") or f"HTTP {status_code}")
+
+
+class QueryCache:
+    """Deduplicates identical backend GETs across every client that shares it."""
+
+    def __init__(self) -> None:
+        self._flights: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def _key(backend: str, path: str, params: dict) -> str:
+        raw = json.dumps([path, sorted((k, str(v)) for k, v in params.items())])
+        return f"{QUERY_CACHE_PREFIX}{backend}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+    @staticmethod
+    def _ttl(window_end: datetime | None) -> int:
+        settled = window_end is not None and (
+            datetime.now(timezone.utc).timestamp() - window_end.timestamp()
+            >= settings.query_cache_bucket_seconds
+        )
+        return settings.query_cache_ttl_seconds if settled else settings.query_cache_recent_ttl_seconds
+
+    async def get(
+        self,
+        backend: str,
+        path: str,
+        params: dict,
+        load: Callable[[], Awaitable[httpx.Response]],
+        window_end: datetime | None = None,
+    ) -> tuple[int, dict]:
+        """Return ``(status_code, body)`` for a GET, from cache or a shared call.
+
+        Only 200 responses whose body is not a Prometheus/Loki-style error are
+        stored; failures are shared with concurrent waiters but not cached.
+        The shared call runs under the backend's own budget; each caller
+        waits only as long as its own investigation deadline allows.
+        """
+        key = self._key(backend, path, params)
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+        else:
+            # The shared call runs as its own task so one caller being
+            # cancelled (e.g. an investigation timing out) doesn't fail the rest,
+            # and outside any deadline so it doesn't inherit the first caller's
+            with deadline_scope(None):
+                flight = asyncio.ensure_future(self._lookup_or_load(key, load, window_end))
+            self._flights[key] = flight
+            flight.add_done_callback(lambda _f, k=key: self._flights.pop(k, None))
+
+        left = remaining()
+        if left is None:
+            return await asyncio.shield(flight)
+        if left <= 0:
+            raise BackendUnavailable(backend, "investigation deadline reached")
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight), left)
+        except asyncio.TimeoutError:
+            raise BackendUnavailable(backend, "investigation deadline reached") from None
+
+    async def _lookup_or_load(
+        self,
+        key: str,
+        load: Callable[[], Awaitable[httpx.Response]],
+        window_end: datetime | None,
+    ) -> tuple[int, dict]:
+        r = await get_redis()
+        try:
+            cached = await r.get(key)
+        except Exception:
+            logger.warning("Query cache read failed — going to backend", exc_info=True)
+            cached = None
+        if cached is not None:
+            self.hits += 1
+            return 200, loads(cached)
+
+        self.misses += 1
+        resp = await load()
+        body = _body(resp)
+        if resp.status_code == 200 and isinstance(body, dict) and body.get("status") != "error":
+            ttl = self._ttl(window_end)
+            if ttl > 0:
+                try:
+                    await r.set(key, dumps(body), ex=ttl)
+                except Exception:
+                    logger.warning("Query cache write failed", exc_info=True)
+        return resp.status_code, body
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._flights),
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+async def cached_get(
+    cache: QueryCache | None,
+    guard: BackendGuard,
+    http: httpx.AsyncClient,
+    path: str,
+    params: dict,
+    window_end: datetime | None = None,
+) -> tuple[int, dict]:
+    """GET through ``cache`` when one is configured, else straight to the backend.
+
+    Requests that reach the backend run under ``guard`` (budget, hedging, circuit).
+    """
+    def load() -> Awaitable[httpx.Response]:
+        return guard.call(lambda: http.get(path, params=params))
+
+    if cache is None:
+        resp = await load()
+        return resp.status_code, _body(resp)
+    return await cache.get(guard.backend, path, params, load, window_end)
@@ -0,0 +1,54 @@
+"""Shared HTTP transport for the observability backends.
+
+Every backend client gets its ``httpx.AsyncClient`` from ``build_client`` so
+pool sizes, keep-alive, HTTP/2 and compression are configured in one place,
+and response bodies are decoded with orjson when it is installed.
+"""
+
+from __future__ import annotations
+
+import json
+
+import httpx
+
+from agent.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+_DEFAULT_POOL_SIZE = 10
+
+
+def loads(data: bytes | str):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def decode_json(resp: httpx.Response):
+    """``resp.json()``, but with the fast decoder when available."""
+    return loads(resp.content)
+
+
+def build_client(backend: str, base_url: str) -> httpx.AsyncClient:
+    """Client for one backend with its own connection pool (``http_pool_sizes``)."""
+    pool = settings.http_pool_sizes.get(backend, _DEFAULT_POOL_SIZE)
+    return httpx.AsyncClient(
+        base_url=base_url,
+        timeout=settings.http_timeout_seconds,
+        http2=settings.http2,
+        limits=httpx.Limits(
+            max_connections=pool,
+            max_keepalive_connections=pool,
+            keepalive_expiry=settings.http_keepalive_seconds,
+        ),
+        headers={"Accept-Encoding": "gzip, deflate"},
+    )
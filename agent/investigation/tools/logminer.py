@@ -0,0 +1,156 @@
+"""Log template mining — collapse raw log lines into Drain-style templates.
+
+Lines are masked (numbers, ids, addresses become ``<*>``), then routed by
+token count and first token to a small set of candidate templates; a line
+joins the most similar one above the threshold, widening differing tokens to
+``<*>``, or starts a new template. Cost per line is bounded by the candidates
+in its leaf, and the output size depends on the number of distinct templates,
+not on the line count. Once ``max_templates`` exist, lines join their nearest
+template, or are only counted when no template of their shape exists.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+WILDCARD = "<*>"
+
+_MASKS = [
+    re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"),
+    re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"),
+    re.compile(r"\b(?:0x)?(?=[0-9a-fA-F]*\d)[0-9a-fA-F]{8,}\b"),
+    re.compile(r"[-+]?\b\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b"),
+]
+_TRACE_RE = re.compile(r"trace_?id[\"'=: ]+([0-9a-fA-F]{16,32})", re.IGNORECASE)
+_EXEMPLAR_CHARS = 300
+
+
+def _mask(message: str) -> list[str]:
+    for pattern in _MASKS:
+        message = pattern.sub(WILDCARD, message)
+    return message.split()
+
+
+def _parse(line: str, labels: dict) -> tuple[str, str]:
+    """Message and trace id of a raw line (JSON-structured or plain)."""
+    message, trace_id = line, ""
+    if line.startswith("{"):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if isinstance(record, dict):
+            message = str(record.get("message") or record.get("msg") or line)
+            trace_id = str(record.get("trace_id") or record.get("traceID") or record.get("traceId") or "")
+    if not trace_id:
+        trace_id = labels.get("trace_id") or labels.get("traceID") or ""
+    if not trace_id:
+        match = _TRACE_RE.search(line)
+        trace_id = match.group(1) if match else ""
+    if trace_id.strip("0") == "":
+        trace_id = ""
+    return message, trace_id
+
+
+@dataclass
+class _Template:
+    tokens: list[str]
+    count: int = 0
+    first_ns: int = 0
+    last_ns: int = 0
+    exemplars: list[dict] = field(default_factory=list)
+
+    def similarity(self, tokens: list[str]) -> tuple[float, int]:
+        same = wild = 0
+        for a, b in zip(self.tokens, tokens):
+            if a == WILDCARD:
+                wild += 1
+            elif a == b:
+                same += 1
+        return same / len(tokens), wild
+
+
+class LogTemplateMiner:
+    """Streaming Drain-style clustering of log lines into templates."""
+
+    def __init__(
+        self,
+        similarity: float = 0.5,
+        max_templates: int = 500,
+        exemplars: int = 3,
+    ) -> None:
+        self._similarity = similarity
+        self._max_templates = max_templates
+        self._exemplars = exemplars
+        self._leaves: dict[tuple[int, str], list[_Template]] = {}
+        self._count = 0
+        self._overflow = 0  # lines with no template to join once the cap is reached
+        self.lines = 0
+
+    def add(self, line: str, timestamp_ns: int = 0, labels: dict | None = None) -> None:
+        message, trace_id = _parse(line, labels or {})
+        tokens = _mask(message) or [WILDCARD]
+        head = tokens[0] if WILDCARD not in tokens[0] else WILDCARD
+        leaf = self._leaves.setdefault((len(tokens), head), [])
+
+        best, best_score = None, (-1.0, -1)
+        for template in leaf:
+            score = template.similarity(tokens)
+            if score > best_score:
+                best, best_score = template, score
+        # At the template cap, lines join their nearest template instead
+        full = self._count >= self._max_templates
+        if best is None and full:
+            self.lines += 1
+            self._overflow += 1
+            return
+        if best is None or (best_score[0] < self._similarity and not full):
+            best = _Template(tokens=list(tokens), first_ns=timestamp_ns, last_ns=timestamp_ns)
+            leaf.append(best)
+            self._count += 1
+        else:
+            best.tokens = [a if a == b else WILDCARD for a, b in zip(best.tokens, tokens)]
+
+        self.lines += 1
+        best.count += 1
+        if timestamp_ns:
+            best.first_ns = min(best.first_ns or timestamp_ns, timestamp_ns)
+            best.last_ns = max(best.last_ns, timestamp_ns)
+        if len(best.exemplars) < self._exemplars and (
+            trace_id or len(best.exemplars) < self._exemplars - 1
+        ):
+            best.exemplars.append({"line": message[:_EXEMPLAR_CHARS], "trace_id": trace_id})
+
+    def summary(self, limit: int = 20) -> dict:
+        """Top templates by count, plus totals for the ones left out."""
+        templates = sorted(
+            (t for leaf in self._leaves.values() for t in leaf),
+            key=lambda t: t.count,
+            reverse=True,
+        )
+        shown, rest = templates[:limit], templates[limit:]
+        return {
+            "lines": self.lines,
+            "templates": len(templates),
+            "top": [
+                {
+                    "template": " ".join(t.tokens),
+                    "count": t.count,
+                    "first_seen": _iso(t.first_ns),
+                    "last_seen": _iso(t.last_ns),
+                    "exemplars": t.exemplars,
+                }
+                for t in shown
+            ],
+            "other_templates": len(rest),
+            "other_lines": sum(t.count for t in rest) + self._overflow,
+        }
+
+
+def _iso(ns: int) -> str | None:
+    if not ns:
+        return None
+    return datetime.fromtimestamp(ns / 1e9, timezone.utc).isoformat()
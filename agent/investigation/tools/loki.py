@@ -2,66 +2,294 @@
 
 from __future__ import annotations
 
+import asyncio
+import heapq
 import logging
+import math
+import re
+from collections.abc import AsyncIterator
+from contextlib import aclosing
 from datetime import datetime, timedelta, timezone
 
-import httpx
-
 from agent.config import settings
+from agent.investigation.tools.cache import QueryCache, bucket_window, cached_get, response_error
+from agent.investigation.tools.http import build_client
+from agent.investigation.tools.resilience import BackendGuard
+from agent.investigation.tools.logminer import LogTemplateMiner
 
 logger = logging.getLogger("agent.investigation.tools")
 
+_COUNT_INTENT = re.compile(
+    r"\b(?:count|counts|how many|number of|rate|per (?:second|minute|hour)|frequency|volume)\b",
+    re.IGNORECASE,
+)
+_MIN_STEP_SECONDS = 60
+
+
+def is_metric_query(logql: str) -> bool:
+    """LogQL log queries start with a stream selector; anything else is a metric query."""
+    return not logql.lstrip().startswith("{")
+
+
+def wants_count(purpose: str) -> bool:
+    """Whether a query's stated purpose only needs counts, not the lines themselves."""
+    return bool(_COUNT_INTENT.search(purpose))
+
+
+def run_mode(logql: str, purpose: str = "") -> str:
+    """How ``LokiClient.run`` will execute a query: ``metric``, ``count`` or ``lines``."""
+    if is_metric_query(logql):
+        return "metric"
+    return "count" if wants_count(purpose) else "lines"
+
+
+def _step_seconds(start: datetime, end: datetime) -> int:
+    span = max((end - start).total_seconds(), 0)
+    points = max(settings.prometheus_points_per_series, 1)
+    seconds = math.ceil(span / points / _MIN_STEP_SECONDS) * _MIN_STEP_SECONDS
+    return max(seconds, _MIN_STEP_SECONDS)
+
+
+class LokiQueryError(Exception):
+    """Loki rejected a query (e.g. a LogQL parse error)."""
+
 
 class LokiClient:
-    def __init__(self) -> None:
-        self._http = httpx.AsyncClient(
-            base_url=settings.loki_url,
-            timeout=15.0,
-        )
+    def __init__(self, cache: QueryCache | None = None) -> None:
+        self._http = build_client("loki", settings.loki_url)
+        self._cache = cache
+        self.guard = BackendGuard("loki")
 
     async def close(self) -> None:
         await self._http.aclose()
 
+    async def iter_lines(
+        self,
+        logql: str,
+        start: datetime,
+        end: datetime,
+        direction: str = "backward",
+        max_lines: int | None = None,
+        page_size: int | None = None,
+    ) -> AsyncIterator[tuple[int, str, dict]]:
+        """Yield ``(timestamp_ns, line, labels)`` across the range, one page at a time.
+
+        Each page narrows the window to the last timestamp seen (``end`` when
+        going backward, ``start`` when going forward). The boundary timestamp
+        is kept inclusive so lines sharing it aren't lost, and lines already
+        yielded at that timestamp are skipped. Only one page is held in memory;
+        a consumer that has seen enough can simply stop iterating.
+
+        Raises ``LokiQueryError`` when Loki rejects the query.
+        """
+        page_size = page_size or settings.loki_page_size
+        backward = direction == "backward"
+        start, end = bucket_window(start, end)
+        lo, hi = int(start.timestamp()) * 10**9, int(end.timestamp()) * 10**9
+        boundary_ts, boundary_seen = None, set()
+        yielded = 0
+
+        while lo < hi:
+            want = page_size if max_lines is None else min(page_size, max_lines - yielded)
+            if want <= 0:
+                return
+            # Lines at the inclusive boundary come back again; fetch past them
+            want += len(boundary_seen)
+            status_code, body = await cached_get(self._cache, self.guard, self._http, "/loki/api/v1/query_range", {
+                "query": logql,
+                "start": str(lo),
+                "end": str(hi),
+                "limit": want,
+                "direction": direction,
+            }, datetime.fromtimestamp(hi / 1e9, timezone.utc))
+            error = response_error(status_code, body)
+            if error is not None:
+                raise LokiQueryError(error)
+
+            streams = body.get("data", {}).get("result", [])
+            entries = heapq.merge(
+                *(
+                    [(int(ts), line, stream.get("stream", {})) for ts, line in stream.get("values", [])]
+                    for stream in streams
+                ),
+                key=lambda e: e[0],
+                reverse=backward,
+            )
+
+            received = progressed = 0
+            for ts, line, labels in entries:
+                received += 1
+                identity = (line, tuple(sorted(labels.items())))
+                if ts == boundary_ts and identity in boundary_seen:
+                    continue
+                if ts != boundary_ts:
+                    boundary_ts, boundary_seen = ts, set()
+                boundary_seen.add(identity)
+                progressed += 1
+                yielded += 1
+                yield ts, line, labels
+                if yielded == max_lines:
+                    return
+
+            if received < want:
+                return
+            if not progressed:
+                # A full page of lines at one timestamp — nothing left to advance past
+                logger.warning("Loki pagination stalled at %d for %s", boundary_ts, logql)
+                return
+            if backward:
+                hi = boundary_ts + 1
+            else:
+                lo = boundary_ts
+
     async def query_range(
         self,
         logql: str,
         start: datetime | None = None,
         end: datetime | None = None,
-        limit: int = 100,
+        limit: int | None = None,
+        sample: int = 5,
     ) -> dict:
-        """Execute a LogQL range query."""
+        """Execute a LogQL range query.
+
+        Up to ``limit`` lines (default ``loki_line_limit``) are streamed
+        through ``iter_lines`` and mined into ``patterns``; only ``sample``
+        raw lines are kept.
+        """
         now = datetime.now(timezone.utc)
         start = start or now - timedelta(minutes=settings.query_lookback_minutes)
         end = end or now
+        limit = limit or settings.loki_line_limit
 
-        resp = await self._http.get("/loki/api/v1/query_range", params={
-            "query": logql,
-            "start": str(int(start.timestamp())),
-            "end": str(int(end.timestamp())),
-            "limit": limit,
-        })
-        body = resp.json()
-
-        streams = body.get("data", {}).get("result", [])
+        miner = LogTemplateMiner(max_templates=max(settings.loki_max_templates, settings.loki_max_patterns))
         log_lines = []
-        for stream in streams:
-            for ts, line in stream.get("values", []):
-                log_lines.append({"timestamp": ts, "line": line, "labels": stream.get("stream", {})})
+        streams = set()
+        try:
+            async with aclosing(self.iter_lines(logql, start, end, max_lines=limit)) as lines:
+                async for ts, line, labels in lines:
+                    streams.add(tuple(sorted(labels.items())))
+                    miner.add(line, ts, labels)
+                    if len(log_lines) < sample:
+                        log_lines.append({"timestamp": str(ts), "line": line, "labels": labels})
+        except LokiQueryError as exc:
+            logger.warning("LogQL range query failed: %s — %s", logql, exc)
+            return {"query": logql, "status": "error", "error": str(exc), "result": []}
 
         return {
             "query": logql,
             "status": "success",
             "streams": len(streams),
-            "total_lines": len(log_lines),
-            "lines": log_lines[:limit],
+            "total_lines": miner.lines,
+            "truncated": miner.lines >= limit,
+            "patterns": miner.summary(settings.loki_max_patterns),
+            "lines": log_lines,
         }
 
-    async def query_instant(self, logql: str) -> dict:
+    async def query_instant(self, logql: str, time: datetime | None = None) -> dict:
         """Execute a LogQL instant query (useful for metric-style log queries)."""
-        resp = await self._http.get("/loki/api/v1/query", params={"query": logql})
-        body = resp.json()
+        params: dict = {"query": logql}
+        if time:
+            params["time"] = str(int(time.timestamp()) * 10**9)
+        status_code, body = await cached_get(self._cache, self.guard, self._http, "/loki/api/v1/query", params, time)
+        error = response_error(status_code, body)
+        if error is not None:
+            logger.warning("LogQL instant query failed: %s — %s", logql, error)
+            return {"query": logql, "status": "error", "error": error, "result": []}
         return {
             "query": logql,
             "status": "success",
             "result": body.get("data", {}).get("result", []),
         }
+
+    async def query_metric_range(
+        self,
+        logql: str,
+        start: datetime,
+        end: datetime,
+        step: int | None = None,
+    ) -> dict:
+        """Execute a LogQL metric query over a range; shaped like a PromQL matrix."""
+        start, end = bucket_window(start, end)
+        step = step or _step_seconds(start, end)
+        status_code, body = await cached_get(self._cache, self.guard, self._http, "/loki/api/v1/query_range", {
+            "query": logql,
+            "start": str(int(start.timestamp())),
+            "end": str(int(end.timestamp())),
+            "step": f"{step}s",
+        }, end)
+        error = response_error(status_code, body)
+        if error is not None:
+            logger.warning("LogQL metric query failed: %s — %s", logql, error)
+            return {"query": logql, "status": "error", "error": error, "result": []}
+        data = body.get("data", {})
+        return {
+            "query": logql,
+            "status": "success",
+            "result_type": data.get("resultType", "matrix"),
+            "step": f"{step}s",
+            "result": data.get("result", []),
+        }
+
+    async def count(
+        self,
+        logql: str,
+        start: datetime,
+        end: datetime,
+        by: list[str] | None = None,
+    ) -> dict:
+        """Exact line counts computed in Loki with ``count_over_time``.
+
+        Returns the total over the whole window (per group when ``by`` is
+        given) and a per-step count series — no log lines cross the wire.
+        """
+        start, end = bucket_window(start, end)
+        step = _step_seconds(start, end)
+        window = int((end - start).total_seconds())
+        grouping = f" by ({', '.join(by)})" if by else ""
+        series_q = f"sum{grouping} (count_over_time({logql} [{step}s]))"
+        total_q = f"sum{grouping} (count_over_time({logql} [{window}s]))"
+
+        series, total = await asyncio.gather(
+            self.query_metric_range(series_q, start, end, step),
+            self.query_instant(total_q, time=end),
+        )
+        if series["status"] == "error" or total["status"] == "error":
+            error = series.get("error") or total.get("error")
+            return {"query": logql, "status": "error", "error": error, "result": []}
+
+        groups = [
+            {"labels": r.get("metric", {}), "count": int(float(r.get("value", [0, 0])[1]))}
+            for r in total["result"]
+        ]
+        response = {
+            "query": logql,
+            "status": "success",
+            "aggregation": series_q,
+            "total": sum(g["count"] for g in groups),
+            "result_type": series["result_type"],
+            "step": series["step"],
+            "result": series["result"],
+        }
+        if by:
+            response["by_group"] = groups
+        return response
+
+    async def run(
+        self,
+        logql: str,
+        start: datetime,
+        end: datetime,
+        purpose: str = "",
+    ) -> dict:
+        """Run a query the cheapest way its intent allows.
+
+        Metric queries go to Loki as written; log queries whose purpose only
+        asks for counts are rewritten to ``count_over_time``; everything else
+        is read and mined into patterns.
+        """
+        mode = run_mode(logql, purpose)
+        if mode == "metric":
+            return await self.query_metric_range(logql, start, end)
+        if mode == "count":
+            return await self.count(logql, start, end)
+        return await self.query_range(logql, start=start, end=end)
@@ -3,21 +3,56 @@
 from __future__ import annotations
 
 import logging
+import math
+import statistics
 from datetime import datetime, timedelta, timezone
 
-import httpx
-
 from agent.config import settings
+from agent.investigation.tools.cache import QueryCache, bucket_window, cached_get
+from agent.investigation.tools.http import build_client, decode_json
+from agent.investigation.tools.resilience import BackendGuard
 
 logger = logging.getLogger("agent.investigation.tools")
 
+_MIN_STEP_SECONDS = 15
+_DROPPED_LABELS_SHOWN = 10
+
+
+def _series_score(series: dict) -> tuple[float, float]:
+    """Rank a matrix series by how much it moves, then by how large it is."""
+    values = []
+    for _, v in series.get("values", []):
+        try:
+            x = float(v)
+        except (TypeError, ValueError):
+            continue
+        if math.isfinite(x):
+            values.append(x)
+    if not values:
+        return 0.0, 0.0
+    spread = statistics.pvariance(values) if len(values) > 1 else 0.0
+    return spread, max(abs(x) for x in values)
+
+
+def cap_series(result: list[dict], max_series: int) -> tuple[list[dict], dict | None]:
+    """Keep the ``max_series`` most variable series; describe what was dropped."""
+    if max_series <= 0 or len(result) <= max_series:
+        return result, None
+    ranked = sorted(result, key=_series_score, reverse=True)
+    kept, dropped = ranked[:max_series], ranked[max_series:]
+    return kept, {
+        "total_series": len(result),
+        "kept": len(kept),
+        "ranked_by": "variance, then magnitude",
+        "dropped_labels": [s.get("metric", {}) for s in dropped[:_DROPPED_LABELS_SHOWN]],
+    }
+
 
 class PrometheusClient:
-    def __init__(self) -> None:
-        self._http = httpx.AsyncClient(
-            base_url=settings.prometheus_url,
-            timeout=15.0,
-        )
+    def __init__(self, cache: QueryCache | None = None) -> None:
+        self._http = build_client("prometheus", settings.prometheus_url)
+        self._cache = cache
+        self.guard = BackendGuard("prometheus")
 
     async def close(self) -> None:
         await self._http.aclose()
@@ -26,10 +61,11 @@ class PrometheusClient:
         """Execute a PromQL instant query."""
         params: dict = {"query": promql}
         if time:
+            # Round down: evaluating later than asked could pull in points past the window
+            time, _ = bucket_window(time, time)
             params["time"] = time.timestamp()
 
-        resp = await self._http.get("/api/v1/query", params=params)
-        body = resp.json()
+        _, body = await cached_get(self._cache, self.guard, self._http, "/api/v1/query", params, time)
 
         if body.get("status") != "success":
             logger.warning("PromQL query failed: %s — %s", promql, body.get("error"))
@@ -42,39 +78,57 @@ class PrometheusClient:
             "result": body["data"]["result"],
         }
 
+    @staticmethod
+    def step_for(start: datetime, end: datetime) -> str:
+        """Step that yields about ``prometheus_points_per_series`` points over the window."""
+        span = max((end - start).total_seconds(), 0)
+        points = max(settings.prometheus_points_per_series, 1)
+        seconds = math.ceil(span / points / _MIN_STEP_SECONDS) * _MIN_STEP_SECONDS
+        return f"{max(seconds, _MIN_STEP_SECONDS)}s"
+
     async def range_query(
         self,
         promql: str,
         start: datetime | None = None,
         end: datetime | None = None,
-        step: str = "15s",
+        step: str | None = None,
     ) -> dict:
-        """Execute a PromQL range query."""
+        """Execute a PromQL range query.
+
+        The step defaults to ``step_for`` the window, and the result is capped
+        at ``prometheus_max_series`` series (see ``cap_series``).
+        """
         now = datetime.now(timezone.utc)
         start = start or now - timedelta(minutes=settings.query_lookback_minutes)
         end = end or now
+        step = step or self.step_for(start, end)
+        start, end = bucket_window(start, end)
 
-        resp = await self._http.get("/api/v1/query_range", params={
+        _, body = await cached_get(self._cache, self.guard, self._http, "/api/v1/query_range", {
             "query": promql,
             "start": start.timestamp(),
             "end": end.timestamp(),
             "step": step,
-        })
-        body = resp.json()
+        }, end)
 
         if body.get("status") != "success":
             logger.warning("PromQL range query failed: %s — %s", promql, body.get("error"))
             return {"query": promql, "status": "error", "error": body.get("error"), "result": []}
 
-        return {
+        result, truncated = cap_series(body["data"]["result"], settings.prometheus_max_series)
+        response = {
             "query": promql,
             "status": "success",
             "result_type": body["data"]["resultType"],
-            "result": body["data"]["result"],
+            "step": step,
+            "result": result,
         }
+        if truncated:
+            response["truncated"] = truncated
+        return response
 
     async def get_alerts(self) -> list[dict]:
         """Fetch currently firing alerts from Prometheus."""
-        resp = await self._http.get("/api/v1/alerts")
-        body = resp.json()
+        resp = await self.guard.call(lambda: self._http.get("/api/v1/alerts"))
+        body = decode_json(resp)
         return body.get("data", {}).get("alerts", [])
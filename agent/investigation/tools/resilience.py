@@ -0,0 +1,168 @@
+"""Backend latency budgets, hedged requests and circuit breaking.
+
+Each backend client owns a ``BackendGuard``. Requests get the backend's
+latency budget instead of the flat HTTP timeout; once enough latencies have
+been observed, a request still running at the backend's p95 gets a duplicate
+(hedge) and the first response wins. Consecutive failures open a circuit
+that fails calls immediately until a cooldown probe succeeds.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+
+import httpx
+
+from agent.config import settings
+from agent.investigation.deadline import remaining
+
+logger = logging.getLogger("agent.investigation.tools")
+
+_LATENCY_SAMPLES = 200
+
+
+class BackendUnavailable(Exception):
+    """A backend call was short-circuited or ran out of its latency budget."""
+
+    def __init__(self, backend: str, reason: str) -> None:
+        super().__init__(f"{backend} unavailable: {reason}")
+        self.backend = backend
+        self.reason = reason
+
+
+class BackendGuard:
+    """Latency budget, p95 hedging and a circuit breaker for one backend."""
+
+    def __init__(self, backend: str) -> None:
+        self.backend = backend
+        self._latencies: deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self.hedges = 0
+        self.short_circuited = 0
+
+    @property
+    def budget(self) -> float:
+        return settings.backend_latency_budgets.get(self.backend, settings.http_timeout_seconds)
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= settings.circuit_cooldown_seconds:
+            return "half_open"
+        return "open"
+
+    def p95(self) -> float | None:
+        if len(self._latencies) < settings.hedge_min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+
+    def _admit(self) -> None:
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return
+        self.short_circuited += 1
+        retry_in = settings.circuit_cooldown_seconds - (time.monotonic() - (self._opened_at or 0))
+        raise BackendUnavailable(self.backend, f"circuit open, retry in {max(retry_in, 0):.0f}s")
+
+    def _succeeded(self, latency: float) -> None:
+        self._latencies.append(latency)
+        self._failures = 0
+        if self._opened_at is not None:
+            logger.info("Circuit for %s closed", self.backend)
+        self._opened_at = None
+        self._probing = False
+
+    def _failed(self) -> None:
+        self._failures += 1
+        if self._probing or (
+            self._opened_at is None and self._failures >= settings.circuit_failure_threshold
+        ):
+            logger.warning("Circuit for %s opened after %d failures", self.backend, self._failures)
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+    async def call(self, request: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """Run an idempotent request within the budget, hedging once after p95.
+
+        5xx responses and transport errors count as failures for the circuit
+        but are still returned or raised to the caller.
+        """
+        # Inside an investigation the budget shrinks to what its deadline leaves
+        budget = self.budget
+        left = remaining()
+        capped = left is not None and left < budget
+        if capped:
+            if left <= 0:
+                raise BackendUnavailable(self.backend, "investigation deadline reached")
+            budget = left
+
+        self._admit()
+        started = time.monotonic()
+        deadline = started + budget
+        hedge_after = self.p95() if settings.hedge_enabled else None
+        tasks = [asyncio.ensure_future(request())]
+        error: BaseException | None = None
+        try:
+            while tasks:
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                timeout = deadline - now
+                can_hedge = hedge_after is not None and len(tasks) == 1 and error is None
+                if can_hedge:
+                    timeout = min(timeout, max(started + hedge_after - now, 0))
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.remove(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    resp = task.result()
+                    if resp.status_code >= 500:
+                        self._failed()
+                    else:
+                        self._succeeded(time.monotonic() - started)
+                    return resp
+                if not done and can_hedge:
+                    self.hedges += 1
+                    hedge_after = None
+                    tasks.append(asyncio.ensure_future(request()))
+        except asyncio.CancelledError:
+            # Caller gave up — not the backend's fault, but free the probe slot
+            self._probing = False
+            raise
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if error is not None:
+            self._failed()
+            raise error
+        if capped:
+            # Cut short by the investigation, not the backend's fault
+            self._probing = False
+            raise BackendUnavailable(self.backend, "investigation deadline reached")
+        self._failed()
+        raise BackendUnavailable(self.backend, f"exceeded its {budget:g}s latency budget")
+
+    def stats(self) -> dict:
+        p95 = self.p95()
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "p95_seconds": round(p95, 3) if p95 is not None else None,
+            "budget_seconds": self.budget,
+            "hedges": self.hedges,
+            "short_circuited": self.short_circuited,
+        }
@@ -2,48 +2,109 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 from datetime import datetime, timedelta, timezone
 
-import httpx
-
 from agent.config import settings
+from agent.investigation.tools.cache import QueryCache, bucket_window, cached_get, response_error
+from agent.investigation.tools.http import build_client
+from agent.investigation.tools.resilience import BackendGuard
+from agent.investigation.traces import summarize_traces
 
 logger = logging.getLogger("agent.investigation.tools")
 
+_ERROR_STATUS = ("STATUS_CODE_ERROR", 2)
+# Span attributes worth keeping in evidence; the rest is instrumentation noise
+_KEPT_ATTRIBUTES = ("http.", "db.", "rpc.", "messaging.", "error", "exception", "net.peer", "server.", "url.")
+
+
+def is_traceql(query: str) -> bool:
+    return query.lstrip().startswith("{")
+
+
+def _attr_value(value: dict):
+    for kind in ("stringValue", "intValue", "doubleValue", "boolValue"):
+        if kind in value:
+            return value[kind]
+    return value
+
+
+def _compact_span(span: dict, service: str, trace_start: int) -> dict:
+    start = int(span.get("startTimeUnixNano", 0))
+    end = int(span.get("endTimeUnixNano", 0))
+    status = span.get("status", {})
+    attributes = {
+        a["key"]: _attr_value(a.get("value", {}))
+        for a in span.get("attributes", [])
+        if a.get("key", "").startswith(_KEPT_ATTRIBUTES)
+    }
+    compact = {
+        "span_id": span.get("spanId", ""),
+        "parent_id": span.get("parentSpanId", ""),
+        "service": service,
+        "name": span.get("name"),
+        "kind": span.get("kind"),
+        "start_ms": round((start - trace_start) / 1e6, 3),
+        "duration_ms": round((end - start) / 1e6, 3),
+        "error": status.get("code") in _ERROR_STATUS,
+    }
+    if status.get("message"):
+        compact["status_message"] = status["message"]
+    exceptions = [
+        {a["key"]: _attr_value(a.get("value", {})) for a in event.get("attributes", [])}
+        for event in span.get("events", [])
+        if event.get("name") == "exception"
+    ]
+    if exceptions:
+        compact["exceptions"] = exceptions
+    if attributes:
+        compact["attributes"] = attributes
+    return compact
+
 
 class TempoClient:
-    def __init__(self) -> None:
-        self._http = httpx.AsyncClient(
-            base_url=settings.tempo_url,
-            timeout=15.0,
-        )
+    def __init__(self, cache: QueryCache | None = None) -> None:
+        self._http = build_client("tempo", settings.tempo_url)
+        self._cache = cache
+        self.guard = BackendGuard("tempo")
+        self._fetch_limit = asyncio.Semaphore(settings.tempo_fetch_concurrency)
 
     async def close(self) -> None:
         await self._http.aclose()
 
     async def search(
         self,
-        tags: str = "",
+        query: str = "",
         start: datetime | None = None,
         end: datetime | None = None,
         limit: int = 20,
     ) -> dict:
-        """Search for traces matching tags within a time window."""
+        """Search for traces within a time window.
+
+        ``query`` is TraceQL (``{ status = error && duration > 2s }``), filtered
+        server-side, or a legacy logfmt tag filter (``service.name=checkout``).
+        """
         now = datetime.now(timezone.utc)
         start = start or now - timedelta(minutes=settings.query_lookback_minutes)
         end = end or now
+        start, end = bucket_window(start, end)
 
         params: dict = {
             "start": str(int(start.timestamp())),
             "end": str(int(end.timestamp())),
             "limit": limit,
         }
-        if tags:
-            params["tags"] = tags
+        if is_traceql(query):
+            params["q"] = query
+        elif query:
+            params["tags"] = query
 
-        resp = await self._http.get("/api/search", params=params)
-        body = resp.json()
+        status_code, body = await cached_get(self._cache, self.guard, self._http, "/api/search", params, end)
+        error = response_error(status_code, body)
+        if error is not None:
+            logger.warning("Tempo search failed: %s — %s", query, error)
+            return {"query": query, "status": "error", "error": error, "traces_found": 0, "traces": []}
 
         traces = body.get("traces", [])
         return {
@@ -53,31 +114,79 @@ class TempoClient:
         }
 
     async def get_trace(self, trace_id: str) -> dict:
-        """Retrieve the full span tree for a specific trace."""
-        resp = await self._http.get(f"/api/traces/{trace_id}")
-        if resp.status_code != 200:
+        """Retrieve a trace as a flat list of compact spans (see ``_compact_span``)."""
+        status_code, body = await cached_get(self._cache, self.guard, self._http, f"/api/traces/{trace_id}", {})
+        if status_code == 404:
             return {"trace_id": trace_id, "status": "not_found"}
+        error = response_error(status_code, body)
+        if error is not None:
+            return {"trace_id": trace_id, "status": "error", "error": error}
 
-        body = resp.json()
-        batches = body.get("batches", [])
-        spans = []
+        batches = body.get("batches", body.get("resourceSpans", []))
+        raw = []
         for batch in batches:
+            resource = {
+                a["key"]: _attr_value(a.get("value", {}))
+                for a in batch.get("resource", {}).get("attributes", [])
+            }
+            service = str(resource.get("service.name", ""))
             for scope_spans in batch.get("scopeSpans", batch.get("instrumentationLibrarySpans", [])):
                 for span in scope_spans.get("spans", []):
-                    spans.append({
-                        "name": span.get("name"),
-                        "kind": span.get("kind"),
-                        "status": span.get("status", {}),
-                        "duration_ns": int(span.get("endTimeUnixNano", 0)) - int(span.get("startTimeUnixNano", 0)),
-                        "attributes": {
-                            a["key"]: a.get("value", {})
-                            for a in span.get("attributes", [])
-                        },
-                    })
+                    raw.append((service, span))
 
+        trace_start = min((int(span.get("startTimeUnixNano", 0)) for _, span in raw), default=0)
+        spans = sorted(
+            (_compact_span(span, service, trace_start) for service, span in raw),
+            key=lambda sp: sp["start_ms"],
+        )
         return {
             "trace_id": trace_id,
             "status": "success",
             "span_count": len(spans),
+            "error_spans": sum(1 for sp in spans if sp["error"]),
             "spans": spans,
         }
+
+    async def fetch_traces(self, trace_ids: list[str]) -> list[dict]:
+        """Fetch full traces concurrently, at most ``tempo_fetch_concurrency`` at a time."""
+        async def fetch(trace_id: str) -> dict:
+            async with self._fetch_limit:
+                try:
+                    return await self.get_trace(trace_id)
+                except Exception as exc:
+                    logger.warning("Trace fetch failed: %s", trace_id, exc_info=True)
+                    return {"trace_id": trace_id, "status": "error", "error": str(exc)}
+
+        return list(await asyncio.gather(*(fetch(t) for t in trace_ids)))
+
+    async def search_traces(
+        self,
+        query: str = "",
+        start: datetime | None = None,
+        end: datetime | None = None,
+        limit: int = 20,
+        fetch: int | None = None,
+    ) -> dict:
+        """Search, then fetch the first ``fetch`` matches (default ``tempo_fetch_traces``) in full.
+
+        ``analysis`` (critical paths, per-operation latency) is computed over
+        the complete span trees; the returned traces then keep error spans
+        first, then the slowest, up to ``tempo_max_spans_per_trace``.
+        """
+        found = await self.search(query, start=start, end=end, limit=limit)
+        if found["status"] == "error":
+            return found
+        fetch = settings.tempo_fetch_traces if fetch is None else fetch
+        ids = [t.get("traceID") for t in found["traces"][:fetch] if t.get("traceID")]
+        traces = await self.fetch_traces(ids) if ids else []
+        analysis = summarize_traces(traces)
+
+        cap = settings.tempo_max_spans_per_trace
+        for trace in traces:
+            spans = trace.get("spans", [])
+            if len(spans) > cap:
+                keep = sorted(spans, key=lambda sp: (not sp["error"], -sp["duration_ms"]))[:cap]
+                trace["spans"] = sorted(keep, key=lambda sp: sp["start_ms"])
+                trace["spans_omitted"] = len(spans) - cap
+
+        return {**found, "full_traces": traces, "analysis": analysis}
@@ -0,0 +1,159 @@
+"""Trace analysis — span trees, critical paths, self-time and per-operation latency.
+
+Works on the compact spans from ``TempoClient.get_trace`` (``span_id``,
+``parent_id``, ``start_ms``, ``duration_ms``). A latency question is answered
+by where the time went: the critical path through each trace, and which
+operations' own (self) time dominates across all fetched traces.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+
+import numpy as np
+
+# Latency histogram bucket upper bounds, in milliseconds
+HISTOGRAM_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+_TOP_OPERATIONS = 10
+
+
+def _op(span: dict) -> str:
+    return f"{span.get('service') or '?'}:{span.get('name')}"
+
+
+def _end(span: dict) -> float:
+    return span["start_ms"] + span["duration_ms"]
+
+
+def build_tree(spans: list[dict]) -> tuple[list[dict], dict[str, list[dict]]]:
+    """Roots and a parent-id → children map; spans with a missing parent become roots."""
+    ids = {s["span_id"] for s in spans}
+    children: dict[str, list[dict]] = defaultdict(list)
+    roots = []
+    for span in spans:
+        parent = span.get("parent_id")
+        if parent and parent in ids and parent != span["span_id"]:
+            children[parent].append(span)
+        else:
+            roots.append(span)
+    return roots, children
+
+
+def self_time(span: dict, children: list[dict]) -> float:
+    """Span duration not covered by any child (overlapping children counted once)."""
+    lo, hi = span["start_ms"], _end(span)
+    covered = 0.0
+    cursor = lo
+    for child in sorted(children, key=lambda c: c["start_ms"]):
+        start, end = max(child["start_ms"], cursor), min(_end(child), hi)
+        if end > start:
+            covered += end - start
+            cursor = end
+    return max(hi - lo - covered, 0.0)
+
+
+def critical_path(root: dict, children: dict[str, list[dict]]) -> list[tuple[dict, float]]:
+    """``(span, ms)`` segments of the longest blocking chain under ``root``.
+
+    Walks back from the span's end: the last-finishing child before the
+    cursor is on the path, time between children is the parent's own.
+    """
+    path: list[tuple[dict, float]] = []
+    stack = [(root, _end(root))]
+    while stack:
+        span, cursor = stack.pop()
+        lo = span["start_ms"]
+        own = 0.0
+        for child in sorted(children.get(span["span_id"], []), key=_end, reverse=True):
+            child_end = min(_end(child), cursor)
+            if child_end <= lo or child["start_ms"] >= cursor:
+                continue
+            own += cursor - child_end
+            stack.append((child, child_end))
+            cursor = max(child["start_ms"], lo)
+        own += cursor - lo
+        if own > 0:
+            path.append((span, own))
+    return path
+
+
+def analyze_trace(trace: dict) -> dict:
+    """Duration, critical path by operation and top self-time operations for one trace."""
+    spans = trace.get("spans", [])
+    if not spans:
+        return {"trace_id": trace.get("trace_id"), "span_count": 0}
+    roots, children = build_tree(spans)
+    root = max(roots, key=lambda s: s["duration_ms"])
+
+    on_path: dict[str, float] = defaultdict(float)
+    for span, ms in critical_path(root, children):
+        on_path[_op(span)] += ms
+    own: dict[str, float] = defaultdict(float)
+    for span in spans:
+        own[_op(span)] += self_time(span, children.get(span["span_id"], []))
+
+    total = root["duration_ms"] or 1.0
+    return {
+        "trace_id": trace.get("trace_id"),
+        "root": _op(root),
+        "duration_ms": root["duration_ms"],
+        "span_count": len(spans),
+        "error_spans": sum(1 for s in spans if s.get("error")),
+        "critical_path": [
+            {"operation": op, "ms": round(ms, 3), "share": round(ms / total, 3)}
+            for op, ms in sorted(on_path.items(), key=lambda kv: kv[1], reverse=True)[:_TOP_OPERATIONS]
+        ],
+        "self_time": [
+            {"operation": op, "ms": round(ms, 3)}
+            for op, ms in sorted(own.items(), key=lambda kv: kv[1], reverse=True)[:_TOP_OPERATIONS]
+        ],
+    }
+
+
+def aggregate_operations(traces: list[dict]) -> list[dict]:
+    """Per-operation latency percentiles, histogram and self-time across traces."""
+    durations: dict[str, list[float]] = defaultdict(list)
+    own: dict[str, float] = defaultdict(float)
+    errors: dict[str, int] = defaultdict(int)
+    for trace in traces:
+        spans = trace.get("spans", [])
+        _, children = build_tree(spans)
+        for span in spans:
+            op = _op(span)
+            durations[op].append(span["duration_ms"])
+            own[op] += self_time(span, children.get(span["span_id"], []))
+            errors[op] += bool(span.get("error"))
+
+    edges = np.array((0,) + HISTOGRAM_BUCKETS_MS + (np.inf,), dtype=float)
+    operations = []
+    for op, values in durations.items():
+        arr = np.asarray(values)
+        p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+        counts, _ = np.histogram(arr, bins=edges)
+        operations.append({
+            "operation": op,
+            "count": int(arr.size),
+            "errors": errors[op],
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+            "max_ms": round(float(arr.max()), 3),
+            "self_time_ms": round(own[op], 3),
+            # le (upper bound, ms) → count; empty buckets omitted
+            "histogram": {
+                ("+Inf" if np.isinf(hi) else str(int(hi))): int(n)
+                for hi, n in zip(edges[1:], counts)
+                if n
+            },
+        })
+    operations.sort(key=lambda o: o["self_time_ms"], reverse=True)
+    return operations[:_TOP_OPERATIONS * 2]
+
+
+def summarize_traces(traces: list[dict]) -> dict:
+    """Analysis of a batch of fetched traces: one entry per trace plus the operation aggregate."""
+    fetched = [t for t in traces if t.get("status") == "success"]
+    return {
+        "traces": [analyze_trace(t) for t in fetched],
+        "operations": aggregate_operations(fetched),
+    }
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import logging
 import sys
+import time
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -14,11 +15,15 @@ from agent.enrichment.correlator import SignalCorrelator
 from agent.enrichment.knowledge import KnowledgeStore
 from agent.ingestion.models import NormalizedAlert
 from agent.ingestion.receiver import router as alert_router
+from agent.investigation.checkpoint import RedisCheckpointSaver
 from agent.investigation.executor import InvestigationExecutor
 from agent.investigation.graph import compile_investigation_graph
+from agent.investigation.llm_cache import LLMResponseCache
+from agent.investigation.tools.cache import QueryCache
 from agent.investigation.tools.loki import LokiClient
 from agent.investigation.tools.prometheus import PrometheusClient
 from agent.investigation.tools.tempo import TempoClient
+from agent.queue.concurrency import AdaptiveConcurrencyController, LLMTelemetryCallback
 from agent.queue.redis_client import close_redis, get_redis
 from agent.queue.worker import InvestigationWorker
 from agent.reporting.artifacts import ArtifactStore
@@ -35,14 +40,17 @@ logger = logging.getLogger("agent")
 knowledge: KnowledgeStore | None = None
 artifacts: ArtifactStore | None = None
 _compiled_graph = None
+_checkpointer: RedisCheckpointSaver | None = None
 _correlator: SignalCorrelator | None = None
 _prometheus: PrometheusClient | None = None
 _loki: LokiClient | None = None
 _tempo: TempoClient | None = None
+_query_cache: QueryCache | None = None
+_llm_cache: LLMResponseCache | None = None
 _worker: InvestigationWorker | None = None
 
 
-def _build_llm():
+def _build_llm(callbacks: list | None = None, cache: LLMResponseCache | None = None):
     if settings.llm_provider == "anthropic":
         from langchain_anthropic import ChatAnthropic
         return ChatAnthropic(
@@ -50,6 +58,8 @@ def _build_llm():
             api_key=settings.anthropic_api_key,
             temperature=settings.llm_temperature,
             max_tokens=4096,
+            callbacks=callbacks,
+            cache=cache,
         )
     elif settings.llm_provider == "openai":
         from langchain_openai import ChatOpenAI
@@ -57,6 +67,8 @@ def _build_llm():
             model=settings.llm_model,
             api_key=settings.openai_api_key,
             temperature=settings.llm_temperature,
+            callbacks=callbacks,
+            cache=cache,
         )
     else:
         raise ValueError(f"Unsupported LLM provider: {settings.llm_provider}")
@@ -64,8 +76,8 @@ def _build_llm():
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global knowledge, artifacts, _compiled_graph, _worker
-    global _correlator, _prometheus, _loki, _tempo
+    global knowledge, artifacts, _compiled_graph, _checkpointer, _worker
+    global _correlator, _prometheus, _loki, _tempo, _query_cache, _llm_cache
 
     logger.info("Initializing SRE Agent...")
 
@@ -83,27 +95,33 @@ async def lifespan(app: FastAPI):
         logger.exception("Knowledge store initialization failed — continuing without runbooks")
         knowledge = None
 
-    # Observability clients
-    _prometheus = PrometheusClient()
-    _loki = LokiClient()
-    _tempo = TempoClient()
-    _correlator = SignalCorrelator()
+    # Observability clients — one query cache shared by every caller
+    _query_cache = QueryCache()
+    _prometheus = PrometheusClient(_query_cache)
+    _loki = LokiClient(_query_cache)
+    _tempo = TempoClient(_query_cache)
+    _correlator = SignalCorrelator(_prometheus, _loki, _tempo)
 
     # Enrichment
     context_builder = ContextBuilder(knowledge, _correlator)
 
+    # Adaptive concurrency — fed by backend query and LLM call telemetry
+    controller = AdaptiveConcurrencyController()
+
     # Investigation executor
-    executor = InvestigationExecutor(_prometheus, _loki, _tempo)
+    executor = InvestigationExecutor(_prometheus, _loki, _tempo, on_query=controller.record_backend)
 
-    # LLM + Graph
-    llm = _build_llm()
-    _compiled_graph = compile_investigation_graph(llm, context_builder, executor)
+    # LLM + Graph (checkpointed in Redis so retried investigations resume)
+    _llm_cache = LLMResponseCache() if settings.llm_cache_enabled else None
+    llm = _build_llm(callbacks=[LLMTelemetryCallback(controller)], cache=_llm_cache)
+    _checkpointer = RedisCheckpointSaver()
+    _compiled_graph = compile_investigation_graph(llm, context_builder, executor, _checkpointer)
 
     # Artifact store
     artifacts = ArtifactStore(knowledge)
 
     # Investigation worker — pulls from Redis stream with concurrency control
-    _worker = InvestigationWorker(_run_investigation)
+    _worker = InvestigationWorker(_run_investigation, controller, abandon_fn=_discard_investigation)
     await _worker.start()
 
     logger.info("SRE Agent ready — listening on %s:%d", settings.host, settings.port)
@@ -112,7 +130,6 @@ async def lifespan(app: FastAPI):
 
     # Cleanup
     await _worker.stop()
-    await _correlator.close()
     await _prometheus.close()
     await _loki.close()
     await _tempo.close()
@@ -120,37 +137,57 @@ async def lifespan(app: FastAPI):
     logger.info("SRE Agent shut down")
 
 
+async def _discard_investigation(alert: NormalizedAlert) -> None:
+    """Drop the checkpoints of an investigation the worker gave up on."""
+    await _checkpointer.adelete_thread(alert.id)
+    logger.info("Discarded checkpoints of abandoned investigation alert=%s", alert.id)
+
+
 async def _run_investigation(alert: NormalizedAlert) -> None:
-    """Execute a full investigation for a normalized alert."""
+    """Execute a full investigation for a normalized alert.
+
+    Failures propagate to the worker, which logs them and acknowledges the entry.
+    """
     logger.info("Starting investigation for alert=%s name=%s", alert.id, alert.name)
 
-    try:
+    config = {"configurable": {"thread_id": alert.id}}
+    # Finish (with a partial report if need be) before the worker's hard timeout
+    deadline = time.time() + settings.investigation_timeout_seconds - settings.deadline_margin_seconds
+
+    snapshot = await _compiled_graph.aget_state(config)
+    if snapshot.next:
+        # An earlier attempt was interrupted — continue from its last completed node
+        # with this attempt's deadline
+        logger.info("Resuming investigation for alert=%s at %s", alert.id, ", ".join(snapshot.next))
+        await _compiled_graph.aupdate_state(config, {"deadline": deadline, "deadline_exceeded": False})
+        result = await _compiled_graph.ainvoke(None, config)
+    else:
         initial_state = {
             "alert": alert,
             "evidence": [],
+            "analyzed_iteration": 0,
             "iteration": 0,
             "max_iterations": settings.max_investigation_iterations,
             "root_cause_found": False,
             "confidence": 0.0,
             "status": "investigating",
+            "deadline": deadline,
         }
+        result = await _compiled_graph.ainvoke(initial_state, config)
 
-        result = await _compiled_graph.ainvoke(initial_state)
+    report = result.get("rca_report", {})
+    if artifacts:
+        artifacts.save_report(report)
+        artifacts.feed_back_to_knowledge(report)
 
-        report = result.get("rca_report", {})
-        if artifacts:
-            artifacts.save_report(report)
-            artifacts.feed_back_to_knowledge(report)
+    await _checkpointer.adelete_thread(alert.id)
 
-        logger.info(
-            "Investigation complete: alert=%s status=%s confidence=%.0f%%",
-            alert.id,
-            result.get("status", "unknown"),
-            result.get("confidence", 0) * 100,
-        )
-
-    except Exception:
-        logger.exception("Investigation failed for alert=%s", alert.id)
+    logger.info(
+        "Investigation complete: alert=%s status=%s confidence=%.0f%%",
+        alert.id,
+        result.get("status", "unknown"),
+        result.get("confidence", 0) * 100,
+    )
 
 
 # FastAPI app 
@@ -177,32 +214,81 @@ async def health():
 
 @app.get("/queue/stats")
 async def queue_stats():
-    """Show current queue depth and consumer group info."""
+    """Show per-lane queue depth, wait times and consumer group info."""
     r = await get_redis()
-    from agent.queue.redis_client import CONSUMER_GROUP, STREAM_KEY
-
-    stream_len = await r.xlen(STREAM_KEY)
-
-    try:
-        groups = await r.xinfo_groups(STREAM_KEY)
-    except Exception:
-        groups = []
-
-    group_info = {}
-    for g in groups:
-        if g.get("name") == CONSUMER_GROUP:
-            group_info = {
-                "pending": g.get("pending", 0),
-                "consumers": g.get("consumers", 0),
-                "last_delivered_id": g.get("last-delivered-id", ""),
-            }
-            break
+    from agent.queue.redis_client import CONSUMER_GROUP, LANES, lane_key
+
+    waits = _worker.lane_waits() if _worker else {}
+    lanes = {}
+    for lane in LANES:
+        stream = lane_key(lane)
+        stream_len = await r.xlen(stream)
+
+        try:
+            groups = await r.xinfo_groups(stream)
+        except Exception:
+            groups = []
+
+        group_info = {}
+        for g in groups:
+            if g.get("name") == CONSUMER_GROUP:
+                group_info = {
+                    "pending": g.get("pending", 0),
+                    "lag": g.get("lag"),
+                    "consumers": g.get("consumers", 0),
+                    "last_delivered_id": g.get("last-delivered-id", ""),
+                }
+                break
+
+        # Age of the oldest entry not yet handed to any consumer
+        oldest_wait = 0.0
+        last_id = group_info.get("last_delivered_id") or "0-0"
+        waiting = await r.xrange(stream, min=f"({last_id}", max="+", count=1)
+        if waiting:
+            oldest_ms = int(waiting[0][0].split("-", 1)[0])
+            oldest_wait = round(max(time.time() - oldest_ms / 1000, 0.0), 3)
+
+        # MEMORY USAGE with SAMPLES 0 walks the whole stream for an exact figure
+        try:
+            memory_bytes = (await r.memory_usage(stream, samples=0) or 0) if stream_len else 0
+        except Exception:
+            memory_bytes = 0  # MEMORY disabled (e.g. some managed Redis offerings)
+
+        lanes[lane] = {
+            "stream_length": stream_len,
+            "memory_bytes": memory_bytes,
+            "bytes_per_alert": round(memory_bytes / stream_len) if stream_len and memory_bytes else None,
+            "consumer_group": group_info,
+            "oldest_waiting_seconds": oldest_wait,
+            **waits.get(lane, {}),
+        }
 
+    total_len = sum(lane["stream_length"] for lane in lanes.values())
+    total_bytes = sum(lane["memory_bytes"] for lane in lanes.values())
     return {
-        "stream_length": stream_len,
-        "consumer_group": group_info,
-        "max_concurrent": settings.max_concurrent_investigations,
+        "stream_length": total_len,
+        "stream_memory_bytes": total_bytes,
+        "bytes_per_alert": round(total_bytes / total_len) if total_len and total_bytes else None,
+        "stream_maxlen": settings.stream_maxlen,
+        "lanes": lanes,
+        "lane_policy": _worker.lane_policy if _worker else settings.lane_policy,
+        "max_concurrent": _worker.controller.limit if _worker else min(
+            settings.max_concurrent_investigations, settings.cluster_max_concurrent_investigations,
+        ),
+        "concurrency": _worker.controller.stats() if _worker else {},
+        "in_flight": _worker.in_flight if _worker else 0,
+        "coalescing": _worker.deferred if _worker else 0,
+        "consumer": _worker.consumer_name if _worker else "",
+        "cluster_max_concurrent": settings.cluster_max_concurrent_investigations,
+        "cluster_in_flight": await _worker.cluster_in_flight() if _worker else 0,
         "dedup_window_seconds": settings.dedup_window_seconds,
+        "query_cache": _query_cache.stats() if _query_cache else {},
+        "llm_cache": _llm_cache.stats() if _llm_cache else {},
+        "backends": {
+            client.guard.backend: client.guard.stats()
+            for client in (_prometheus, _loki, _tempo)
+            if client is not None
+        },
     }
 
 
@@ -0,0 +1,70 @@
+"""Alert coalescing — fold near-simultaneous related alerts into one investigation."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+
+from agent.config import settings
+from agent.ingestion.models import NormalizedAlert
+from agent.queue.redis_client import COALESCE_PREFIX, get_redis
+
+logger = logging.getLogger("agent.queue.coalesce")
+
+
+def coalesce_key(alert: NormalizedAlert) -> str:
+    """Redis key shared by alerts that should be investigated together, or "" if none.
+
+    ``coalesce_by`` picks the identity: Alertmanager ``group_key``, the alert's
+    ``service`` (falling back to ``job`` / ``instance`` labels), or the values
+    of ``coalesce_labels``.
+    """
+    if settings.coalesce_window_seconds <= 0:
+        return ""
+
+    if settings.coalesce_by == "group_key":
+        ident = alert.group_key
+    elif settings.coalesce_by == "service":
+        labels = alert.labels
+        ident = labels.get("service") or labels.get("job") or labels.get("instance", "")
+    elif settings.coalesce_by == "labels":
+        ident = ",".join(
+            f"{k}={alert.labels[k]}" for k in settings.coalesce_labels if k in alert.labels
+        )
+    else:
+        raise ValueError(f"Unsupported coalesce_by: {settings.coalesce_by}")
+
+    if not ident:
+        return ""
+    return f"{COALESCE_PREFIX}{hashlib.sha1(ident.encode()).hexdigest()[:16]}"
+
+
+def members_key(alert: NormalizedAlert) -> str:
+    """List holding alerts folded into ``alert`` (mirrors the key built in the enqueue script)."""
+    return f"{coalesce_key(alert)}:{alert.id}"
+
+
+async def collect_members(alert: NormalizedAlert) -> NormalizedAlert:
+    """Attach every alert folded into ``alert``.
+
+    The worker parks an alert until its coalescing window has closed before
+    dispatching it, so by now no more members can arrive.
+    """
+    if not coalesce_key(alert):
+        return alert
+
+    r = await get_redis()
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.lrange(members_key(alert), 0, -1)
+        pipe.delete(members_key(alert))
+        payloads, _ = await pipe.execute()
+
+    if not payloads:
+        return alert
+
+    members = [NormalizedAlert.model_validate_json(p) for p in payloads]
+    logger.info(
+        "Coalesced %d alerts into investigation %s (%s): %s",
+        len(members), alert.id, alert.name, ", ".join(m.name for m in members),
+    )
+    return alert.model_copy(update={"related_alerts": [*alert.related_alerts, *members]})
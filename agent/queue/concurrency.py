@@ -0,0 +1,168 @@
+"""Adaptive concurrency — AIMD limit on in-flight investigations from observed health."""
+
+from __future__ import annotations
+
+import logging
+import statistics
+import time
+from collections import deque
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+
+from agent.config import settings
+
+logger = logging.getLogger("agent.queue.concurrency")
+
+
+def _is_throttle(error: BaseException) -> bool:
+    """True for provider rate-limit errors (HTTP 429) from either LLM SDK."""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or "RateLimit" in type(error).__name__
+
+
+def _is_cached(response: Any) -> bool:
+    """True when every generation was served by the LLM response cache, not the provider."""
+    generations = [g for batch in getattr(response, "generations", []) for g in batch]
+    return bool(generations) and all((g.generation_info or {}).get("cached") for g in generations)
+
+
+class AdaptiveConcurrencyController:
+    """Additive-increase / multiplicative-decrease controller for investigation slots.
+
+    Every ``concurrency_adjust_interval_seconds`` the samples gathered since the
+    previous adjustment are checked in order: any LLM 429, LLM error rate, LLM median
+    latency, then backend error rate and p90 latency. The first breached signal
+    halves the limit; if none is breached and the worker filled every slot
+    during the interval, the limit grows by one. The limit stays within
+    ``[concurrency_min, ceiling]``.
+
+    One replica can never run more investigations than the cluster-wide lease
+    cap allows, so ``ceiling`` is ``concurrency_max`` clamped to
+    ``cluster_max_concurrent_investigations``; growing past it would only
+    report slots that can't be filled.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = settings.adaptive_concurrency
+        self.ceiling = max(min(settings.concurrency_max, settings.cluster_max_concurrent_investigations), 1)
+        self.floor = min(settings.concurrency_min, self.ceiling)
+        self.limit = min(settings.max_concurrent_investigations, self.ceiling)
+        if self.enabled and self.ceiling < settings.concurrency_max:
+            logger.info(
+                "Concurrency ceiling %d (cluster cap) is below concurrency_max=%d",
+                self.ceiling, settings.concurrency_max,
+            )
+        self.reason = "static limit" if not self.enabled else "initial limit"
+        self._llm: deque[tuple[float, float, bool, bool]] = deque(maxlen=500)  # (ts, latency, ok, throttled)
+        self._backend: deque[tuple[float, str, float, bool]] = deque(maxlen=2000)  # (ts, backend, latency, ok)
+        self._saturated = False
+        self._last_adjust = time.monotonic()
+        self._history: deque[dict] = deque(maxlen=10)
+
+    # ── Observations ────────────────────────────────────────────────
+
+    def record_llm(self, latency: float, ok: bool = True, throttled: bool = False) -> None:
+        self._llm.append((time.monotonic(), latency, ok, throttled))
+
+    def record_backend(self, backend: str, latency: float, ok: bool = True) -> None:
+        self._backend.append((time.monotonic(), backend, latency, ok))
+
+    # ── Control ─────────────────────────────────────────────────────
+
+    def update(self, in_flight: int) -> int:
+        """Return the current limit, adjusting it once per interval."""
+        if not self.enabled:
+            return self.limit
+
+        if in_flight >= self.limit:
+            self._saturated = True
+
+        now = time.monotonic()
+        if now - self._last_adjust < settings.concurrency_adjust_interval_seconds:
+            return self.limit
+
+        llm = [s for s in self._llm if s[0] >= self._last_adjust]
+        backend = [s for s in self._backend if s[0] >= self._last_adjust]
+
+        breach = self._breach(llm, backend)
+        if breach:
+            self._set(max(self.limit // 2, self.floor), breach)
+        elif self._saturated and (llm or backend):
+            self._set(min(self.limit + 1, self.ceiling), "healthy and saturated")
+
+        self._saturated = in_flight >= self.limit
+        self._last_adjust = now
+        return self.limit
+
+    def _breach(self, llm: list, backend: list) -> str:
+        threshold = settings.concurrency_error_rate_threshold
+
+        throttled = sum(1 for *_, t in llm if t)
+        if throttled:
+            return f"LLM rate limited ({throttled}x 429)"
+
+        if llm:
+            errors = sum(1 for _, _, ok, _ in llm if not ok)
+            if errors / len(llm) > threshold:
+                return f"LLM error rate {errors}/{len(llm)}"
+            latencies = [latency for _, latency, ok, _ in llm if ok]
+            median = statistics.median(latencies) if latencies else 0.0
+            if median > settings.llm_latency_target_seconds:
+                return f"LLM median latency {median:.1f}s > {settings.llm_latency_target_seconds:.0f}s"
+
+        for name in sorted({b for _, b, _, _ in backend}):
+            samples = [(latency, ok) for _, b, latency, ok in backend if b == name]
+            errors = sum(1 for _, ok in samples if not ok)
+            if errors / len(samples) > threshold:
+                return f"{name} error rate {errors}/{len(samples)}"
+            latencies = sorted(latency for latency, _ in samples)
+            p90 = latencies[min(int(len(latencies) * 0.9), len(latencies) - 1)]
+            if p90 > settings.backend_latency_target_seconds:
+                return f"{name} p90 latency {p90:.1f}s > {settings.backend_latency_target_seconds:.0f}s"
+
+        return ""
+
+    def _set(self, limit: int, reason: str) -> None:
+        if limit == self.limit:
+            self.reason = f"holding at bound ({reason})"
+            return
+        logger.warning("Concurrency limit %d -> %d: %s", self.limit, limit, reason)
+        self._history.append({"at": time.time(), "from": self.limit, "to": limit, "reason": reason})
+        self.limit = limit
+        self.reason = reason
+
+    def stats(self) -> dict:
+        return {
+            "adaptive": self.enabled,
+            "limit": self.limit,
+            "reason": self.reason,
+            "bounds": [self.floor, self.ceiling],
+            "recent_adjustments": list(self._history),
+        }
+
+
+class LLMTelemetryCallback(AsyncCallbackHandler):
+    """Feeds LLM call latency, errors and 429s into the concurrency controller."""
+
+    def __init__(self, controller: AdaptiveConcurrencyController) -> None:
+        self._controller = controller
+        self._started: dict[UUID, float] = {}
+
+    async def on_chat_model_start(self, serialized: dict, messages: list, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.monotonic()
+
+    async def on_llm_start(self, serialized: dict, prompts: list[str], *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.monotonic()
+
+    async def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        started = self._started.pop(run_id, None)
+        # Answers from the response cache say nothing about provider latency
+        if started is not None and not _is_cached(response):
+            self._controller.record_llm(time.monotonic() - started)
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        started = self._started.pop(run_id, None)
+        latency = time.monotonic() - started if started is not None else 0.0
+        self._controller.record_llm(latency, ok=False, throttled=_is_throttle(error))
@@ -0,0 +1,90 @@
+"""Cluster-wide investigation leases — caps concurrent investigations across replicas."""
+
+from __future__ import annotations
+
+import logging
+from uuid import uuid4
+
+from agent.config import settings
+from agent.queue.redis_client import LEASE_KEY, get_redis
+
+logger = logging.getLogger("agent.queue.lease")
+
+# Leases live in a sorted set scored by expiry (ms, Redis server clock). Expired
+# leases from crashed replicas are swept before every grant, so a dead pod can
+# never hold slots for longer than the lease TTL.
+_ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+local free = tonumber(ARGV[2]) - redis.call('ZCARD', KEYS[1])
+local granted = {}
+for i = 3, #ARGV do
+  if free <= 0 then break end
+  redis.call('ZADD', KEYS[1], now + tonumber(ARGV[1]), ARGV[i])
+  granted[#granted + 1] = ARGV[i]
+  free = free - 1
+end
+return granted
+"""
+
+_RENEW_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local renewed = 0
+for i = 2, #ARGV do
+  renewed = renewed + redis.call('ZADD', KEYS[1], 'XX', 'CH', now + tonumber(ARGV[1]), ARGV[i])
+end
+return renewed
+"""
+
+
+class InvestigationLeases:
+    """Redis-backed counting semaphore shared by every worker replica."""
+
+    def __init__(self, owner: str) -> None:
+        self._owner = owner
+        self._acquire = None
+        self._renew = None
+
+    async def _scripts(self):
+        if self._acquire is None:
+            r = await get_redis()
+            self._acquire = r.register_script(_ACQUIRE_SCRIPT)
+            self._renew = r.register_script(_RENEW_SCRIPT)
+        return self._acquire, self._renew
+
+    async def acquire(self, n: int) -> list[str]:
+        """Try to take up to ``n`` leases; returns the tokens actually granted."""
+        if n <= 0:
+            return []
+        acquire, _ = await self._scripts()
+        tokens = [f"{self._owner}:{uuid4().hex[:8]}" for _ in range(n)]
+        granted = await acquire(
+            keys=[LEASE_KEY],
+            args=[settings.lease_ttl_seconds * 1000, settings.cluster_max_concurrent_investigations, *tokens],
+        )
+        return list(granted or [])
+
+    async def renew(self, tokens: list[str]) -> None:
+        """Extend the expiry of leases still held by this replica."""
+        if not tokens:
+            return
+        _, renew = await self._scripts()
+        await renew(keys=[LEASE_KEY], args=[settings.lease_ttl_seconds * 1000, *tokens])
+
+    async def release(self, tokens: list[str]) -> None:
+        if not tokens:
+            return
+        r = await get_redis()
+        await r.zrem(LEASE_KEY, *tokens)
+
+    async def active(self) -> int:
+        """Number of unexpired leases across the cluster."""
+        r = await get_redis()
+        return await r.zcount(LEASE_KEY, f"({_now_ms(await r.time())}", "+inf")
+
+
+def _now_ms(server_time: tuple[int, int]) -> int:
+    seconds, micros = server_time
+    return int(seconds) * 1000 + int(micros) // 1000
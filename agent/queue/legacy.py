@@ -0,0 +1,77 @@
+"""One-time move of the pre-lanes ``sre:alerts`` stream into the severity lanes."""
+
+from __future__ import annotations
+
+import logging
+
+from agent.config import settings
+from agent.ingestion.models import NormalizedAlert
+from agent.queue.redis_client import (
+    CONSUMER_GROUP,
+    LANES,
+    MIGRATION_LOCK_KEY,
+    STREAM_KEY,
+    get_redis,
+    lane_key,
+    stream_id_tuple,
+)
+
+logger = logging.getLogger("agent.queue.legacy")
+
+_BATCH = 500
+_LOCK_TTL_SECONDS = 300
+
+
+async def migrate_legacy_stream(owner: str) -> int:
+    """Re-enqueue alerts still unprocessed on the old single stream, then delete it.
+
+    Entries the old consumer group never delivered, or delivered but never
+    acknowledged, go onto their severity lane; acknowledged ones are dropped.
+    Each batch is appended and removed in one transaction, so a replica that
+    dies mid-way leaves nothing to duplicate. Returns the number moved.
+    """
+    r = await get_redis()
+    if await r.type(STREAM_KEY) != "stream":
+        return 0
+    if not await r.set(MIGRATION_LOCK_KEY, owner, nx=True, ex=_LOCK_TTL_SECONDS):
+        return 0  # another replica is on it
+
+    try:
+        groups = await r.xinfo_groups(STREAM_KEY)
+        group = next((g for g in groups if g.get("name") == CONSUMER_GROUP), None)
+        delivered = stream_id_tuple(group["last-delivered-id"]) if group else (0, 0)
+        pending: set[str] = set()
+        if group and group.get("pending"):
+            pending = {
+                p["message_id"]
+                for p in await r.xpending_range(STREAM_KEY, CONSUMER_GROUP, "-", "+", group["pending"])
+            }
+
+        moved = 0
+        start = "-"
+        while True:
+            batch = await r.xrange(STREAM_KEY, min=start, count=_BATCH)
+            if not batch:
+                break
+            start = f"({batch[-1][0]}"
+            async with r.pipeline(transaction=True) as pipe:
+                for msg_id, data in batch:
+                    unprocessed = stream_id_tuple(msg_id) > delivered or msg_id in pending
+                    alert_json = data.get("alert_json", "")
+                    if unprocessed and alert_json:
+                        severity = NormalizedAlert.model_validate_json(alert_json).severity.value
+                        lane = severity if severity in LANES else LANES[-1]
+                        pipe.xadd(lane_key(lane), {"alert_json": alert_json},
+                                  maxlen=settings.stream_maxlen, approximate=True)
+                        moved += 1
+                pipe.xdel(STREAM_KEY, *(msg_id for msg_id, _ in batch))
+                await pipe.execute()
+
+        await r.delete(STREAM_KEY)
+        if moved:
+            logger.warning("Moved %d unprocessed alerts from legacy stream %s into severity lanes", moved, STREAM_KEY)
+        else:
+            logger.info("Removed drained legacy stream %s", STREAM_KEY)
+        return moved
+    finally:
+        await r.delete(MIGRATION_LOCK_KEY)
@@ -7,35 +7,146 @@ import logging
 
 from agent.config import settings
 from agent.ingestion.models import NormalizedAlert
-from agent.queue.redis_client import DEDUP_PREFIX, STREAM_KEY, get_redis
+from agent.queue.coalesce import coalesce_key
+from agent.queue.redis_client import COALESCE_PREFIX, DEDUP_PREFIX, LANES, get_redis, lane_key
 
 logger = logging.getLogger("agent.queue")
 
+# Dedup, coalesce and append a whole webhook payload in one round trip. Alerts
+# are processed in order, so repeats inside the same payload dedup (and
+# coalesce) against each other.
+#   KEYS[3i-2] = dedup key, KEYS[3i-1] = lane stream, KEYS[3i] = coalesce key
+#   ARGV[1] = dedup window (s), ARGV[2] = approximate MAXLEN per lane,
+#   ARGV[3] = coalesce window (s), ARGV[4] = member list TTL (s), then per
+#   alert: encoded alert, alert id, severity rank (0 = most severe), coalesce flag
+#
+# A coalesce key holds "<leader id>|<rank>". Later alerts with the same key are
+# pushed onto the leader's member list instead of the stream, unless they are
+# more severe — those start their own investigation in their own lane and
+# become the new leader.
+_ENQUEUE_SCRIPT = """
+local results = {}
+for i = 1, (#ARGV - 4) / 4 do
+  local a = 4 + (i - 1) * 4
+  local payload, id, rank = ARGV[a + 1], ARGV[a + 2], tonumber(ARGV[a + 3])
+  local ckey = KEYS[3 * i]
+  if not redis.call('SET', KEYS[3 * i - 2], '1', 'NX', 'EX', ARGV[1]) then
+    results[i] = false
+  else
+    local leader = ARGV[a + 4] == '1' and redis.call('GET', ckey)
+    if leader then
+      local sep = string.find(leader, '|', 1, true)
+      local leader_id = string.sub(leader, 1, sep - 1)
+      if rank >= tonumber(string.sub(leader, sep + 1)) then
+        local members = ckey .. ':' .. leader_id
+        redis.call('RPUSH', members, payload)
+        redis.call('EXPIRE', members, ARGV[4])
+        results[i] = 'coalesced:' .. leader_id
+      else
+        leader = false
+      end
+    end
+    if not leader then
+      results[i] = redis.call('XADD', KEYS[3 * i - 1], 'MAXLEN', '~', ARGV[2], '*', 'alert_json', payload)
+      if ARGV[a + 4] == '1' then
+        redis.call('SET', ckey, id .. '|' .. rank, 'EX', ARGV[3])
+      end
+    end
+  end
+end
+return results
+"""
+
+COALESCED_PREFIX = "coalesced:"
+
+# Members must outlive the leader's time in the queue; they are deleted once
+# the leader's investigation collects them.
+_MEMBERS_TTL_SECONDS = 24 * 3600
+
+
+# Annotations already promoted to first-class NormalizedAlert fields
+_PROMOTED_ANNOTATIONS = ("summary", "description")
+
+
+def encode_alert(alert: NormalizedAlert) -> str:
+    """Compact stream encoding of an alert.
+
+    ``raw`` is dropped because its labels, timestamps, fingerprint and
+    generator URL already live on the alert itself; only annotations that were
+    not promoted to fields are kept. Empty optional fields are omitted and the
+    JSON has no whitespace. The result is still valid input for
+    ``NormalizedAlert.model_validate_json``, so readers need no special decoder.
+    """
+    data = alert.model_dump(mode="json", exclude={"raw"}, exclude_none=True)
+    data = {k: v for k, v in data.items() if v not in ("", {}, [])}
+
+    extra = {
+        k: v for k, v in alert.raw.get("annotations", {}).items()
+        if k not in _PROMOTED_ANNOTATIONS
+    }
+    if extra:
+        data["raw"] = {"annotations": extra}
+
+    return json.dumps(data, separators=(",", ":"))
 
-async def enqueue_alert(alert: NormalizedAlert) -> str | None:
-    """Deduplicate and push an alert onto the Redis stream.
 
-    Returns the stream message ID if enqueued, None if deduplicated.
+def _dedup_key(alert: NormalizedAlert) -> str:
+    return f"{DEDUP_PREFIX}{alert.fingerprint or alert.name}"
+
+
+async def enqueue_alerts(alerts: list[NormalizedAlert]) -> list[str | None]:
+    """Deduplicate, coalesce and push a batch of alerts onto their severity lanes atomically.
+
+    Returns one entry per alert: the stream message ID if enqueued,
+    ``"coalesced:<leader alert id>"`` if folded into another alert's
+    investigation, or None if deduplicated.
     """
+    if not alerts:
+        return []
+
     r = await get_redis()
+    script = r.register_script(_ENQUEUE_SCRIPT)
+
+    keys: list[str] = []
+    args: list = [
+        settings.dedup_window_seconds,
+        settings.stream_maxlen,
+        settings.coalesce_window_seconds,
+        _MEMBERS_TTL_SECONDS,
+    ]
+    for alert in alerts:
+        ckey = coalesce_key(alert)
+        keys.extend((_dedup_key(alert), lane_key(alert.severity.value), ckey or COALESCE_PREFIX))
+        args.extend((encode_alert(alert), alert.id, LANES.index(alert.severity.value), 1 if ckey else 0))
+
+    results = await script(keys=keys, args=args)
 
-    dedup_key = f"{DEDUP_PREFIX}{alert.fingerprint or alert.name}"
-    already_seen = await r.set(
-        dedup_key, "1",
-        nx=True,
-        ex=settings.dedup_window_seconds,
-    )
-
-    if not already_seen:
-        logger.info(
-            "Alert deduplicated (seen within %ds): name=%s fingerprint=%s",
-            settings.dedup_window_seconds, alert.name, alert.fingerprint,
-        )
-        return None
-
-    msg_id = await r.xadd(STREAM_KEY, {
-        "alert_json": alert.model_dump_json(),
-    })
-
-    logger.info("Alert enqueued: name=%s id=%s stream_msg=%s", alert.name, alert.id, msg_id)
+    msg_ids: list[str | None] = []
+    for alert, msg_id in zip(alerts, results):
+        if not msg_id:
+            logger.info(
+                "Alert deduplicated (seen within %ds): name=%s fingerprint=%s",
+                settings.dedup_window_seconds, alert.name, alert.fingerprint,
+            )
+        elif msg_id.startswith(COALESCED_PREFIX):
+            logger.info(
+                "Alert coalesced: name=%s id=%s into investigation %s",
+                alert.name, alert.id, msg_id.removeprefix(COALESCED_PREFIX),
+            )
+        else:
+            logger.info(
+                "Alert enqueued: name=%s id=%s lane=%s stream_msg=%s",
+                alert.name, alert.id, alert.severity.value, msg_id,
+            )
+        msg_ids.append(msg_id or None)
+    return msg_ids
+
+
+async def enqueue_alert(alert: NormalizedAlert) -> str | None:
+    """Deduplicate and push an alert onto its severity lane's Redis stream.
+
+    Returns the stream message ID if enqueued, ``"coalesced:<leader alert id>"``
+    if folded into another investigation, None if deduplicated.
+    """
+    (msg_id,) = await enqueue_alerts([alert])
     return msg_id
@@ -8,9 +8,33 @@ from agent.config import settings
 
 _pool: aioredis.Redis | None = None
 
-STREAM_KEY = "sre:alerts"
+STREAM_KEY = "sre:alerts"  # lane prefix; before lanes, the single alert stream
+# One stream per severity lane, in strict-priority order
+LANES = ("critical", "warning", "info")
 CONSUMER_GROUP = "sre-investigators"
 DEDUP_PREFIX = "sre:dedup:"
+LEASE_KEY = "sre:leases"
+COALESCE_PREFIX = "sre:coalesce:"
+CHECKPOINT_PREFIX = "sre:ckpt:"
+ATTEMPTS_PREFIX = "sre:attempts:"
+QUERY_CACHE_PREFIX = "sre:qcache:"
+LLM_CACHE_PREFIX = "sre:llmcache:"
+MIGRATION_LOCK_KEY = "sre:migrate:alerts"
+
+
+def lane_key(lane: str) -> str:
+    """Stream key for a severity lane, e.g. ``sre:alerts:critical``."""
+    return f"{STREAM_KEY}:{lane}"
+
+
+def lane_from_key(stream: str) -> str:
+    return stream.rsplit(":", 1)[-1]
+
+
+def stream_id_tuple(msg_id: str) -> tuple[int, int]:
+    """A stream entry ID as a sortable ``(ms, seq)`` tuple."""
+    ms, _, seq = msg_id.partition("-")
+    return int(ms), int(seq or 0)
 
 
 async def get_redis() -> aioredis.Redis:
@@ -0,0 +1,52 @@
+"""Lane scheduler — decides how free investigation slots are split across severity lanes."""
+
+from __future__ import annotations
+
+import logging
+
+from agent.config import settings
+from agent.queue.redis_client import LANES
+
+logger = logging.getLogger("agent.queue.scheduler")
+
+
+class LaneScheduler:
+    """Allocates free slots across severity lanes.
+
+    ``strict``: every slot goes to the highest-priority lane first; lower lanes
+    only get what higher lanes cannot fill.
+
+    ``weighted``: slots are handed out by smooth weighted round-robin using
+    ``lane_weights``, with credit carried across polls so the long-run share of
+    each lane matches its weight even when only one slot frees at a time.
+    """
+
+    def __init__(self, policy: str | None = None, weights: dict[str, int] | None = None) -> None:
+        self.policy = policy or settings.lane_policy
+        if self.policy not in ("strict", "weighted"):
+            raise ValueError(f"Unsupported lane policy: {self.policy}")
+        weights = weights or settings.lane_weights
+        self._weights = {lane: max(int(weights.get(lane, 1)), 1) for lane in LANES}
+        self._credit = {lane: 0 for lane in LANES}
+
+    def allocate(self, slots: int, lanes: tuple[str, ...] = LANES) -> dict[str, int]:
+        """Return ``{lane: slots}`` for the given lanes, in the order they should be read."""
+        if slots <= 0 or not lanes:
+            return {}
+        if self.policy == "strict":
+            return {lanes[0]: slots}
+
+        alloc = {lane: 0 for lane in lanes}
+        total = sum(self._weights[lane] for lane in lanes)
+        for _ in range(slots):
+            for lane in lanes:
+                self._credit[lane] += self._weights[lane]
+            chosen = max(lanes, key=lambda lane: self._credit[lane])
+            self._credit[chosen] -= total
+            alloc[chosen] += 1
+        return {lane: n for lane, n in alloc.items() if n}
+
+    def idle(self, lane: str) -> None:
+        """Forget a lane's credit once it runs dry — empty lanes bank neither credit nor debt."""
+        self._credit[lane] = 0
+
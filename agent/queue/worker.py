@@ -3,107 +3,437 @@
 from __future__ import annotations
 
 import asyncio
+import heapq
 import logging
+import os
+import socket
+import time
 from typing import Callable, Awaitable
 
 from agent.config import settings
 from agent.ingestion.models import NormalizedAlert
-from agent.queue.redis_client import CONSUMER_GROUP, STREAM_KEY, get_redis
+from agent.queue.coalesce import coalesce_key, collect_members
+from agent.queue.concurrency import AdaptiveConcurrencyController
+from agent.queue.lease import InvestigationLeases
+from agent.queue.legacy import migrate_legacy_stream
+from agent.queue.redis_client import (
+    ATTEMPTS_PREFIX,
+    CONSUMER_GROUP,
+    LANES,
+    get_redis,
+    lane_from_key,
+    lane_key,
+    stream_id_tuple,
+)
+from agent.queue.scheduler import LaneScheduler
 
 logger = logging.getLogger("agent.queue.worker")
 
-CONSUMER_NAME = "worker-1"
+
+def _default_consumer_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _entry_age_seconds(msg_id: str) -> float:
+    """Seconds since a stream entry was added (the ID prefix is its ms timestamp)."""
+    return max(time.time() - int(msg_id.split("-", 1)[0]) / 1000, 0.0)
 
 
 class InvestigationWorker:
-    """Consumes alerts from Redis Stream and runs investigations with bounded concurrency."""
+    """Consumes alerts from Redis Stream and runs investigations with bounded concurrency.
+
+    Entries are only claimed from the stream when an investigation slot is free,
+    so a burst of alerts stays queued in Redis (visible via ``/queue/stats``)
+    instead of being parked in memory as pending tasks. The number of slots is
+    set by an :class:`AdaptiveConcurrencyController`.
+
+    Alerts arrive on one stream per severity lane; free slots are split across
+    lanes by a :class:`LaneScheduler` so critical alerts never queue behind a
+    backlog of warnings.
 
-    def __init__(self, investigate_fn: Callable[[NormalizedAlert], Awaitable[None]]) -> None:
+    Several replicas can share the consumer group: each one reads under its own
+    consumer name, every investigation holds a cluster-wide lease, and entries
+    left pending by a crashed replica are reclaimed with ``XAUTOCLAIM`` once
+    they have been idle for ``reclaim_idle_seconds``.
+
+    An alert that may still have related alerts folded into it (see
+    ``agent.queue.coalesce``) is parked until its coalescing window closes.
+    It holds no cluster lease meanwhile, and it counts against this replica's
+    window only so parked entries can't pile up in memory.
+
+    When an entry is acknowledged without its investigation completing (it
+    failed, or timed out on its last attempt), ``abandon_fn`` is called so
+    the investigation's saved state can be dropped.
+    """
+
+    def __init__(
+        self,
+        investigate_fn: Callable[[NormalizedAlert], Awaitable[None]],
+        controller: AdaptiveConcurrencyController | None = None,
+        abandon_fn: Callable[[NormalizedAlert], Awaitable[None]] | None = None,
+    ) -> None:
         self._investigate = investigate_fn
-        self._semaphore = asyncio.Semaphore(settings.max_concurrent_investigations)
+        self._abandon = abandon_fn
+        self.controller = controller or AdaptiveConcurrencyController()
+        self.consumer_name = settings.consumer_name or _default_consumer_name()
+        self._leases = InvestigationLeases(self.consumer_name)
+        self._scheduler = LaneScheduler()
+        self._in_flight: dict[asyncio.Task, tuple[str, str, str]] = {}  # task -> (lease, stream, msg_id)
+        # Heap of (due epoch seconds, msg_id, stream, alert) waiting out their coalescing window
+        self._deferred: list[tuple[float, str, str, NormalizedAlert]] = []
         self._running = False
         self._task: asyncio.Task | None = None
+        self._heartbeat_task: asyncio.Task | None = None
+        self._trim_task: asyncio.Task | None = None
+        self._reclaim_cursors = {lane: "0-0" for lane in LANES}
+        self._next_reclaim = 0.0
+        self._lane_waits = {lane: {"dispatched": 0, "avg_wait_seconds": 0.0, "max_wait_seconds": 0.0} for lane in LANES}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    @property
+    def deferred(self) -> int:
+        return len(self._deferred)
+
+    @property
+    def free_slots(self) -> int:
+        limit = self.controller.update(len(self._in_flight))
+        return max(limit - len(self._in_flight) - len(self._deferred), 0)
+
+    @property
+    def lane_policy(self) -> str:
+        return self._scheduler.policy
+
+    def lane_waits(self) -> dict[str, dict]:
+        """Per-lane queue wait observed at dispatch time (enqueue → investigation start)."""
+        return {lane: dict(stats) for lane, stats in self._lane_waits.items()}
 
     async def start(self) -> None:
         r = await get_redis()
+        for lane in LANES:
+            stream = lane_key(lane)
+            try:
+                await r.xgroup_create(stream, CONSUMER_GROUP, id="0", mkstream=True)
+                logger.info("Created consumer group '%s' on stream '%s'", CONSUMER_GROUP, stream)
+            except Exception:
+                pass  # group already exists
         try:
-            await r.xgroup_create(STREAM_KEY, CONSUMER_GROUP, id="0", mkstream=True)
-            logger.info("Created consumer group '%s' on stream '%s'", CONSUMER_GROUP, STREAM_KEY)
+            await migrate_legacy_stream(self.consumer_name)
         except Exception:
-            pass  # group already exists
+            logger.exception("Migrating the legacy alert stream failed — will retry on next start")
 
         self._running = True
         self._task = asyncio.create_task(self._poll_loop())
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        self._trim_task = asyncio.create_task(self._trim_loop())
         logger.info(
-            "Worker started: max_concurrent=%d, timeout=%ds",
-            settings.max_concurrent_investigations,
+            "Worker started: consumer=%s, max_concurrent=%d%s (cluster=%d), batch_size=%d, "
+            "lane_policy=%s, timeout=%ds",
+            self.consumer_name,
+            self.controller.limit,
+            " adaptive" if self.controller.enabled else "",
+            settings.cluster_max_concurrent_investigations,
+            settings.worker_batch_size,
+            self._scheduler.policy,
             settings.investigation_timeout_seconds,
         )
 
     async def stop(self) -> None:
         self._running = False
-        if self._task:
-            self._task.cancel()
-            try:
-                await self._task
-            except asyncio.CancelledError:
-                pass
+        for task in (self._task, self._heartbeat_task, self._trim_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        # Cancelled investigations (and parked entries) are left un-ACKed so
+        # another replica reclaims them
+        if self._deferred:
+            logger.info("Leaving %d coalescing alerts pending for reclaim", len(self._deferred))
+        for task in list(self._in_flight):
+            task.cancel()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
         logger.info("Worker stopped")
 
+    async def cluster_in_flight(self) -> int:
+        return await self._leases.active()
+
     async def _poll_loop(self) -> None:
-        """Main loop: read from stream, dispatch with concurrency limit."""
+        """Main loop: lease slots, fill them from due, reclaimed or new entries, dispatch."""
         r = await get_redis()
 
         while self._running:
+            leases: list[str] = []
+            due: list[tuple[float, str, str, NormalizedAlert]] = []
             try:
-                messages = await r.xreadgroup(
-                    CONSUMER_GROUP, CONSUMER_NAME,
-                    {STREAM_KEY: ">"},
-                    count=1,
-                    block=2000,
-                )
+                # Due entries leave the heap before the window is measured, so their
+                # slots are counted in ``free`` exactly once
+                due = self._pop_due()
+                free = self.free_slots
+                if free == 0:
+                    # Window is full — leave the backlog in Redis (and due entries parked)
+                    # until a slot frees up or another coalescing window closes
+                    if self._in_flight:
+                        await asyncio.wait(
+                            self._in_flight, timeout=self._until_next_due(),
+                            return_when=asyncio.FIRST_COMPLETED,
+                        )
+                    else:
+                        await asyncio.sleep(self._until_next_due() or settings.worker_block_ms / 1000)
+                    continue
 
-                if not messages:
+                leases = await self._leases.acquire(min(settings.worker_batch_size, free))
+                if not leases:
+                    # Cluster-wide cap reached — another replica holds every slot
+                    await asyncio.sleep(settings.worker_block_ms / 1000)
                     continue
 
-                for _stream, entries in messages:
-                    for msg_id, data in entries:
-                        alert_json = data.get("alert_json", "")
-                        if not alert_json:
-                            await r.xack(STREAM_KEY, CONSUMER_GROUP, msg_id)
-                            continue
+                # Parked entries are older than anything still in the streams, so they go first
+                while due and leases:
+                    _, msg_id, stream, alert = due.pop(0)
+                    self._record_wait(stream, msg_id)
+                    self._dispatch(alert, stream, msg_id, leases.pop())
+                if not leases:
+                    continue
 
-                        alert = NormalizedAlert.model_validate_json(alert_json)
-                        asyncio.create_task(
-                            self._run_with_guard(alert, msg_id)
-                        )
+                entries = await self._reclaim(len(leases))
+                if len(entries) < len(leases):
+                    entries.extend(await self._read_lanes(len(leases) - len(entries)))
+
+                if not entries:
+                    # Nothing to do — give the leases back before blocking so idle
+                    # replicas never sit on cluster slots, then wait for new entries.
+                    await self._leases.release(leases)
+                    leases = []
+                    block = settings.worker_block_ms
+                    until_due = self._until_next_due()
+                    if until_due is not None:
+                        block = max(min(block, int(until_due * 1000)), 1)
+                    await r.xread({lane_key(lane): "$" for lane in LANES}, block=block)
+                    continue
+
+                for stream, msg_id, data in entries:
+                    alert_json = (data or {}).get("alert_json", "")
+                    if not alert_json:
+                        await r.xack(stream, CONSUMER_GROUP, msg_id)
+                        continue
+
+                    alert = NormalizedAlert.model_validate_json(alert_json)
+                    wait = settings.coalesce_window_seconds - _entry_age_seconds(msg_id)
+                    if wait > 0 and coalesce_key(alert):
+                        # Related alerts may still fold in — park it without a lease
+                        heapq.heappush(self._deferred, (time.time() + wait, msg_id, stream, alert))
+                        continue
+                    self._record_wait(stream, msg_id)
+                    self._dispatch(alert, stream, msg_id, leases.pop())
 
             except asyncio.CancelledError:
                 break
             except Exception:
                 logger.exception("Worker poll error — retrying in 5s")
                 await asyncio.sleep(5)
+            finally:
+                for entry in due:
+                    heapq.heappush(self._deferred, entry)
+                if leases:
+                    await self._leases.release(leases)
+
+    def _pop_due(self) -> list[tuple[float, str, str, NormalizedAlert]]:
+        now = time.time()
+        due = []
+        while self._deferred and self._deferred[0][0] <= now:
+            due.append(heapq.heappop(self._deferred))
+        return due
+
+    def _until_next_due(self) -> float | None:
+        if not self._deferred:
+            return None
+        return max(self._deferred[0][0] - time.time(), 0.0)
+
+    async def _read_lanes(self, slots: int) -> list[tuple[str, str, dict]]:
+        """Fill ``slots`` from the lanes, re-planning until every lane runs dry."""
+        r = await get_redis()
+        entries: list[tuple[str, str, dict]] = []
+        candidates = list(LANES)
+
+        while slots > 0 and candidates:
+            for lane, count in self._scheduler.allocate(slots, tuple(candidates)).items():
+                stream = lane_key(lane)
+                messages = await r.xreadgroup(
+                    CONSUMER_GROUP, self.consumer_name,
+                    {stream: ">"},
+                    count=count,
+                )
+                got = [(stream, msg_id, data) for _s, lane_entries in messages or [] for msg_id, data in lane_entries]
+                entries.extend(got)
+                slots -= len(got)
+                if len(got) < count:
+                    candidates.remove(lane)
+                    self._scheduler.idle(lane)
+
+        return entries
+
+    async def _reclaim(self, count: int) -> list[tuple[str, str, dict | None]]:
+        """Take over entries another consumer left pending for too long, highest lane first."""
+        now = time.monotonic()
+        if now < self._next_reclaim:
+            return []
 
-    async def _run_with_guard(self, alert: NormalizedAlert, msg_id: str) -> None:
-        """Run an investigation with semaphore + timeout, then ACK."""
-        async with self._semaphore:
-            logger.info(
-                "Investigation starting: alert=%s name=%s (msg=%s)",
-                alert.id, alert.name, msg_id,
+        r = await get_redis()
+        reclaimed: list[tuple[str, str, dict | None]] = []
+        swept = True
+        for lane in LANES:
+            if len(reclaimed) >= count:
+                swept = False
+                break
+            stream = lane_key(lane)
+            cursor, entries, *_ = await r.xautoclaim(
+                stream, CONSUMER_GROUP, self.consumer_name,
+                min_idle_time=settings.reclaim_idle_seconds * 1000,
+                start_id=self._reclaim_cursors[lane],
+                count=count - len(reclaimed),
+            )
+            self._reclaim_cursors[lane] = cursor
+            swept = swept and cursor == "0-0"
+            reclaimed.extend((stream, msg_id, data) for msg_id, data in entries)
+
+        if swept:
+            # Scanned every lane's PEL — wait an interval before the next sweep
+            self._next_reclaim = now + settings.reclaim_interval_seconds
+
+        if reclaimed:
+            logger.warning(
+                "Reclaimed %d stale pending entries: %s",
+                len(reclaimed), ", ".join(msg_id for _, msg_id, _ in reclaimed),
             )
+        return reclaimed
+
+    async def _heartbeat_loop(self) -> None:
+        """Keep leases alive and reset PEL idle time for running investigations."""
+        interval = max(settings.lease_ttl_seconds / 3, 1)
+        while self._running:
             try:
-                await asyncio.wait_for(
-                    self._investigate(alert),
-                    timeout=settings.investigation_timeout_seconds,
-                )
-            except asyncio.TimeoutError:
-                logger.error(
-                    "Investigation timed out after %ds: alert=%s name=%s",
-                    settings.investigation_timeout_seconds, alert.id, alert.name,
-                )
-            except Exception:
-                logger.exception("Investigation failed: alert=%s", alert.id)
-            finally:
+                await asyncio.sleep(interval)
+                held = list(self._in_flight.values())
+                # Parked entries hold no lease but must not look abandoned to other replicas
+                pending = [(stream, msg_id) for _, stream, msg_id in held]
+                pending += [(stream, msg_id) for _, msg_id, stream, _ in self._deferred]
+                if not pending:
+                    continue
+                if held:
+                    await self._leases.renew([lease for lease, _, _ in held])
                 r = await get_redis()
-                await r.xack(STREAM_KEY, CONSUMER_GROUP, msg_id)
-                logger.info("Message acknowledged: %s", msg_id)
+                for stream in {stream for stream, _ in pending}:
+                    await r.xclaim(
+                        stream, CONSUMER_GROUP, self.consumer_name,
+                        min_idle_time=0,
+                        message_ids=[msg_id for s, msg_id in pending if s == stream],
+                        justid=True,
+                    )
+            except asyncio.CancelledError:
+                break
+            except Exception:
+                logger.exception("Worker heartbeat failed")
+
+    async def _trim_loop(self) -> None:
+        """Periodically drop stream entries that every consumer has acknowledged."""
+        while self._running:
+            try:
+                await asyncio.sleep(settings.stream_trim_interval_seconds)
+                for lane in LANES:
+                    await self._trim_acknowledged(lane_key(lane))
+            except asyncio.CancelledError:
+                break
+            except Exception:
+                logger.exception("Stream trim failed")
+
+    async def _trim_acknowledged(self, stream: str) -> None:
+        """``XTRIM MINID ~`` up to the oldest entry still pending or undelivered."""
+        r = await get_redis()
+        groups = await r.xinfo_groups(stream)
+        group = next((g for g in groups if g.get("name") == CONSUMER_GROUP), None)
+        if not group or group.get("last-delivered-id", "0-0") == "0-0":
+            return
+
+        # Everything before the last delivered ID has been handed out; of that,
+        # only entries still in the PEL are unacknowledged.
+        safe = group["last-delivered-id"]
+        pending = await r.xpending(stream, CONSUMER_GROUP)
+        if pending.get("pending") and stream_id_tuple(pending["min"]) < stream_id_tuple(safe):
+            safe = pending["min"]
+
+        trimmed = await r.xtrim(stream, minid=safe, approximate=True)
+        if trimmed:
+            logger.info("Trimmed %d acknowledged entries from %s (minid=%s)", trimmed, stream, safe)
+
+    def _record_wait(self, stream: str, msg_id: str) -> None:
+        stats = self._lane_waits.get(lane_from_key(stream))
+        if stats is None:
+            return
+        wait = _entry_age_seconds(msg_id)
+        stats["dispatched"] += 1
+        # Exponential moving average keeps the figure responsive to the current load
+        stats["avg_wait_seconds"] = round(
+            wait if stats["dispatched"] == 1 else 0.8 * stats["avg_wait_seconds"] + 0.2 * wait, 3,
+        )
+        stats["max_wait_seconds"] = round(max(stats["max_wait_seconds"], wait), 3)
+
+    def _dispatch(self, alert: NormalizedAlert, stream: str, msg_id: str, lease: str) -> None:
+        task = asyncio.create_task(self._run_with_guard(alert, stream, msg_id, lease))
+        self._in_flight[task] = (lease, stream, msg_id)
+        task.add_done_callback(lambda t: self._in_flight.pop(t, None))
+
+    async def _run_with_guard(self, alert: NormalizedAlert, stream: str, msg_id: str, lease: str) -> None:
+        """Run an investigation with a timeout, then ACK and release the lease."""
+        logger.info(
+            "Investigation starting: alert=%s name=%s severity=%s (msg=%s, in_flight=%d)",
+            alert.id, alert.name, alert.severity.value, msg_id, len(self._in_flight),
+        )
+        ack = True
+        completed = False
+        try:
+            alert = await collect_members(alert)
+            await asyncio.wait_for(
+                self._investigate(alert),
+                timeout=settings.investigation_timeout_seconds,
+            )
+            completed = True
+        except asyncio.TimeoutError:
+            attempt = await self._record_attempt(msg_id)
+            logger.error(
+                "Investigation timed out after %ds: alert=%s name=%s (attempt %d/%d)",
+                settings.investigation_timeout_seconds, alert.id, alert.name,
+                attempt, settings.investigation_max_attempts,
+            )
+            # Leave the entry pending: once idle it is reclaimed and resumes from its checkpoint
+            ack = attempt >= settings.investigation_max_attempts
+        except asyncio.CancelledError:
+            ack = False
+            raise
+        except Exception:
+            logger.exception("Investigation failed: alert=%s", alert.id)
+        finally:
+            r = await get_redis()
+            if ack:
+                await r.xack(stream, CONSUMER_GROUP, msg_id)
+                logger.info("Message acknowledged: %s %s", stream, msg_id)
+                await r.delete(f"{ATTEMPTS_PREFIX}{msg_id}")
+                if not completed and self._abandon:
+                    try:
+                        await self._abandon(alert)
+                    except Exception:
+                        logger.exception("Cleaning up abandoned investigation failed: alert=%s", alert.id)
+            else:
+                logger.warning("Investigation interrupted, leaving %s pending for reclaim", msg_id)
+            await self._leases.release([lease])
+
+    async def _record_attempt(self, msg_id: str) -> int:
+        r = await get_redis()
+        key = f"{ATTEMPTS_PREFIX}{msg_id}"
+        attempt = await r.incr(key)
+        await r.expire(key, settings.checkpoint_ttl_seconds)
+        return attempt
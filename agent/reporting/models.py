@@ -25,6 +25,7 @@ class RCAReport(BaseModel):
 
     investigation_id: str
     alert_name: str
+    related_alerts: list[str] = []
     severity: str
     status: str  # resolved / escalated
     title: str
@@ -33,6 +34,7 @@ class RCAReport(BaseModel):
     impact: str
     timeline: list[TimelineEntry] = []
     evidence: list[EvidenceItem] = []
+    raw_evidence: list[dict] = []
     hypotheses_evaluated: int = 0
     hypotheses_confirmed: list[str] = []
     hypotheses_rejected: list[str] = []
@@ -41,6 +43,7 @@ class RCAReport(BaseModel):
     confidence: float = 0.0
     investigation_duration_seconds: float = 0.0
     iterations: int = 0
+    stop_reason: str = ""
     escalated: bool = False
     escalation_reason: str = ""
     generated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -8,6 +8,13 @@ import logging
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.language_models import BaseChatModel
 
+from agent.enrichment.context import alert_for_prompt
+from agent.investigation.budget import (
+    Section, alert_section, build_prompt, evidence_section, hypotheses_section, json_item, log_usage,
+    mapping_section, ranked_section,
+)
+from agent.investigation.digest import compact_evidence
+
 logger = logging.getLogger("agent.reporting")
 
 _SYSTEM_PROMPT = """\
@@ -38,24 +45,30 @@ async def generate_rca_report(llm: BaseChatModel, state: dict) -> dict:
     """Generate a structured RCA report from the full investigation state."""
     alert = state.get("alert", {})
     if hasattr(alert, "model_dump"):
-        alert = alert.model_dump(mode="json")
+        alert = alert_for_prompt(alert)
 
     hypotheses = state.get("hypotheses", [])
     hyp_data = [h.model_dump() if hasattr(h, "model_dump") else h for h in hypotheses]
 
-    user_content = (
-        f"Alert:\n{json.dumps(alert, default=str)}\n\n"
-        f"Problem frame:\n{json.dumps(state.get('problem_frame', {}), default=str)}\n\n"
-        f"Hypotheses:\n{json.dumps(hyp_data, default=str)}\n\n"
-        f"Evidence gathered:\n{json.dumps(state.get('evidence', []), default=str)}\n\n"
-        f"Runbook context:\n{chr(10).join(state.get('runbook_context', []))}\n\n"
-        f"Correlation data:\n{json.dumps(state.get('correlation', {}), default=str)}"
-    )
+    alert_obj = state.get("alert")
+    raw_evidence = state.get("evidence", [])
+    starts_at = getattr(alert_obj, "starts_at", None)
+    evidence = compact_evidence(raw_evidence, starts_at) if starts_at else raw_evidence
+
+    user_content = build_prompt([
+        alert_section("Alert", alert),
+        Section("problem_frame", "Problem frame").add(json_item(state.get("problem_frame", {}))),
+        hypotheses_section("Hypotheses", hyp_data),
+        evidence_section("Evidence gathered", evidence),
+        ranked_section("runbooks", "Runbook context", state.get("runbook_context", [])),
+        mapping_section("correlation", "Correlation data", state.get("correlation", {})),
+    ], step="report")
 
     response = await llm.ainvoke([
         SystemMessage(content=_SYSTEM_PROMPT),
         HumanMessage(content=user_content),
     ])
+    log_usage("report", response)
 
     raw = response.content.strip()
     if raw.startswith("```"):
@@ -63,15 +76,18 @@ async def generate_rca_report(llm: BaseChatModel, state: dict) -> dict:
 
     report = json.loads(raw)
 
-    alert_obj = state.get("alert")
     report["investigation_id"] = getattr(alert_obj, "id", "unknown")
     report["alert_name"] = getattr(alert_obj, "name", alert.get("name", "unknown"))
     report["severity"] = getattr(alert_obj, "severity", alert.get("severity", "unknown"))
     if hasattr(report["severity"], "value"):
         report["severity"] = report["severity"].value
+    report["related_alerts"] = [a.name for a in getattr(alert_obj, "related_alerts", [])]
+    # The prompt saw digests; the artifact keeps the full query results
+    report["raw_evidence"] = raw_evidence
     report["status"] = state.get("status", "resolved")
     report["confidence"] = state.get("confidence", 0.0)
     report["iterations"] = state.get("iteration", 0)
+    report["stop_reason"] = state.get("stop_reason", "")
     report["hypotheses_evaluated"] = len(hypotheses)
     report["hypotheses_confirmed"] = [
         h.title if hasattr(h, "title") else h.get("title", "")
@@ -86,3 +102,45 @@ async def generate_rca_report(llm: BaseChatModel, state: dict) -> dict:
 
     logger.info("RCA report generated: %s (confidence=%.0f%%)", report["title"], report["confidence"] * 100)
     return report
+
+
+def build_partial_report(state: dict, reason: str) -> dict:
+    """A report assembled from state alone, for when there is no time left for the LLM."""
+    alert = state.get("alert")
+    hypotheses = state.get("hypotheses", [])
+    evidence = state.get("evidence", [])
+    ranked = sorted(hypotheses, key=lambda h: h.likelihood, reverse=True)
+    best = ranked[0] if ranked else None
+    severity = getattr(alert, "severity", "unknown")
+
+    report = {
+        "title": f"Partial investigation: {getattr(alert, 'name', 'unknown')}",
+        "summary": (
+            f"{reason}. {len(evidence)} queries ran across {state.get('iteration', 0)} iterations; "
+            + (f"leading hypothesis: {best.title} ({best.likelihood:.0%})." if best else "no hypotheses were formed.")
+        ),
+        "root_cause": best.description if best else "Undetermined",
+        "impact": "",
+        "timeline": [],
+        "evidence": [
+            {"tool": e.get("tool", ""), "query": e.get("query", ""), "purpose": e.get("purpose", ""),
+             "finding": e.get("error", "see raw_evidence")}
+            for e in evidence
+        ],
+        "recommended_actions": ["Continue the investigation manually from the hypotheses below"],
+        "runbook_references": [],
+        "investigation_id": getattr(alert, "id", "unknown"),
+        "alert_name": getattr(alert, "name", "unknown"),
+        "severity": getattr(severity, "value", severity),
+        "related_alerts": [a.name for a in getattr(alert, "related_alerts", [])],
+        "raw_evidence": evidence,
+        "status": "escalated",
+        "confidence": state.get("confidence", 0.0),
+        "iterations": state.get("iteration", 0),
+        "stop_reason": state.get("stop_reason", ""),
+        "hypotheses_evaluated": len(hypotheses),
+        "hypotheses_confirmed": [h.title for h in hypotheses if h.status.value == "confirmed"],
+        "hypotheses_rejected": [h.title for h in hypotheses if h.status.value == "rejected"],
+    }
+    logger.info("Partial RCA report assembled without LLM: %s", reason)
+    return report